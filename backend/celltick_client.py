@@ -1,22 +1,60 @@
+import asyncio
+import importlib.util
+
 import httpx
 from datetime import datetime
 from typing import Literal
 
+from .config import CELLTICK_HTTP2, CELLTICK_POOL_SIZE
+
 BASE_URL = "https://contentapi.celltick.com/mediaApi/v1.0/mid/horoscope"
 
 Language = Literal["ru", "en"]
 
+# Общий клиент с пулом keep-alive соединений. Соединения httpx.AsyncClient
+# привязаны к event loop, в котором клиент создан, поэтому запоминаем этот цикл
+# и в другом цикле (например, следующий asyncio.run) создаём клиент заново.
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Клиент для текущего event loop (вызывать изнутри работающего цикла)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # Клиент из завершённого цикла закрыть уже нельзя — его соединения уйдут вместе с циклом
+        _client_loop = loop
+        _client = httpx.AsyncClient(
+            timeout=10,
+            # HTTP/2 требует пакет h2; без него остаёмся на HTTP/1.1 с keep-alive
+            http2=CELLTICK_HTTP2 and importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=CELLTICK_POOL_SIZE,
+                max_keepalive_connections=CELLTICK_POOL_SIZE,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Закрыть пул соединений (перед завершением event loop)."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
 
 async def fetch_all_signs(lang: Language, date_: datetime) -> list[dict]:
     params = {
         "publishDate": date_.strftime("%m/%d/%Y"),
         "language": lang,
     }
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(BASE_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        # по доке Celltick результат — объект с полем items[web:53]
-        items = data.get("items") or data
-        # items должен быть списком объектов со структурами { "sign": ..., "title": ..., "text": ... }
-        return items
+    resp = await get_client().get(BASE_URL, params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    # по доке Celltick результат — объект с полем items[web:53]
+    items = data.get("items") or data
+    # items должен быть списком объектов со структурами { "sign": ..., "title": ..., "text": ... }
+    return items
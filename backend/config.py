@@ -6,3 +6,87 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 FCM_CREDENTIALS_FILE = os.getenv("FCM_CREDENTIALS_FILE", "serviceAccountKey.json")
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+
+# Сколько секунд держать гороскоп в кэше процесса API, прежде чем перечитать из БД
+# (крон генерации работает в другом процессе и не может сбросить наш кэш напрямую)
+HOROSCOPE_CACHE_TTL_SECONDS = int(os.getenv("HOROSCOPE_CACHE_TTL_SECONDS", "300"))
+# Гороскопов на дату ещё нет (крон опоздал, DeepSeek недоступен): API и рассылка берут
+# последний текст по знаку/языку не старше стольких дней (флаг stale), 0 — без фолбэка
+HOROSCOPE_STALE_MAX_DAYS = int(os.getenv("HOROSCOPE_STALE_MAX_DAYS", "3"))
+# Фоновая догенерация недостающих гороскопов при отдаче устаревших
+STALE_REGENERATION = os.getenv("STALE_REGENERATION", "1") == "1"
+# Через сколько секунд можно снова пробовать ключ после неудачной догенерации
+REGENERATION_RETRY_SECONDS = int(os.getenv("REGENERATION_RETRY_SECONDS", "300"))
+
+# Режим рассылки пушей: "batch" — пачками до 500 токенов через send_each_for_multicast,
+# "single" — по одному messaging.send на устройство
+PUSH_SEND_MODE = os.getenv("PUSH_SEND_MODE", "batch")
+
+# Аренда устройств запуском рассылки. Дольше двойного окна (2 × 10 минут), чтобы
+# после падения между отправкой и отметкой устройство не получило пуш повторно
+PUSH_CLAIM_LEASE_MINUTES = int(os.getenv("PUSH_CLAIM_LEASE_MINUTES", "30"))
+# Сколько отправленных устройств отмечать одним UPDATE
+PUSH_ACK_BATCH_SIZE = int(os.getenv("PUSH_ACK_BATCH_SIZE", "500"))
+# Повтор после временной ошибки FCM: через PUSH_RETRY_BASE_MINUTES × 2^(n-1) минут
+# после n-й ошибки подряд, но не позже чем через PUSH_RETRY_MAX_MINUTES
+PUSH_RETRY_BASE_MINUTES = int(os.getenv("PUSH_RETRY_BASE_MINUTES", "2"))
+PUSH_RETRY_MAX_MINUTES = int(os.getenv("PUSH_RETRY_MAX_MINUTES", "240"))
+# Рассылка читает устройства серверным курсором пачками по столько строк (0 — всю выборку сразу)
+PUSH_STREAM_CHUNK_SIZE = int(os.getenv("PUSH_STREAM_CHUNK_SIZE", "500"))
+# Шардированная рассылка: PUSH_WORKERS процессов на узел, всего узлов PUSH_NODES,
+# номер текущего узла PUSH_NODE_INDEX (0..PUSH_NODES-1). Устройство достаётся шарду
+# user_devices.push_shard mod (PUSH_NODES * PUSH_WORKERS); слотов push_shard всего 1024
+# (PUSH_SHARD_SLOTS), поэтому PUSH_NODES * PUSH_WORKERS не больше 1024
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "1"))
+PUSH_NODES = int(os.getenv("PUSH_NODES", "1"))
+PUSH_NODE_INDEX = int(os.getenv("PUSH_NODE_INDEX", "0"))
+
+# Параллельная генерация гороскопов через DeepSeek
+DEEPSEEK_CONCURRENCY = int(os.getenv("DEEPSEEK_CONCURRENCY", "4"))
+# Token bucket: средняя частота запросов в секунду и допустимый всплеск
+DEEPSEEK_RATE_PER_SEC = float(os.getenv("DEEPSEEK_RATE_PER_SEC", "2"))
+DEEPSEEK_RATE_BURST = int(os.getenv("DEEPSEEK_RATE_BURST", "4"))
+# Повторы на 429/5xx и сетевые ошибки: число попыток и базовая задержка (сек)
+DEEPSEEK_MAX_ATTEMPTS = int(os.getenv("DEEPSEEK_MAX_ATTEMPTS", "4"))
+DEEPSEEK_BACKOFF_BASE = float(os.getenv("DEEPSEEK_BACKOFF_BASE", "1.0"))
+# Постоянный кэш ответов DeepSeek в таблице deepseek_responses (0 — всегда звать API)
+# и сколько дней хранить ответы до очистки кроном генерации
+DEEPSEEK_RESPONSE_CACHE = os.getenv("DEEPSEEK_RESPONSE_CACHE", "1") == "1"
+DEEPSEEK_RESPONSE_CACHE_KEEP_DAYS = int(os.getenv("DEEPSEEK_RESPONSE_CACHE_KEEP_DAYS", "14"))
+
+# Пулы HTTP-соединений (keep-alive) к внешним API
+DEEPSEEK_POOL_SIZE = int(os.getenv("DEEPSEEK_POOL_SIZE", str(max(DEEPSEEK_CONCURRENCY, 4))))
+CELLTICK_POOL_SIZE = int(os.getenv("CELLTICK_POOL_SIZE", "10"))
+# HTTP/2 для Celltick, если установлен пакет h2
+CELLTICK_HTTP2 = os.getenv("CELLTICK_HTTP2", "1") == "1"
+
+# Пайплайн предгенерации: языки (через запятую) и горизонт в днях, начиная с сегодня
+GENERATION_LANGS = [l.strip() for l in os.getenv("GENERATION_LANGS", "ru").split(",") if l.strip()]
+GENERATION_HORIZON_DAYS = int(os.getenv("GENERATION_HORIZON_DAYS", "3"))
+
+# Пул соединений с БД (для PostgreSQL; SQLite использует свой пул)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Async-движок для эндпоинтов API: asyncpg для PostgreSQL, aiosqlite для SQLite
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+# Предсериализованные ответы /horoscope/today: отдавать gzip клиентам с Accept-Encoding: gzip
+# и сколько сжатых вариантов (наборов знаков) держать в памяти
+SNAPSHOT_GZIP = os.getenv("SNAPSHOT_GZIP", "1") == "1"
+SNAPSHOT_GZIP_CACHE_SIZE = int(os.getenv("SNAPSHOT_GZIP_CACHE_SIZE", "4096"))
+
+# POST /horoscope/batch: предел числа ключей в запросе (user_ids × dates + keys)
+HOROSCOPE_BATCH_MAX_KEYS = int(os.getenv("HOROSCOPE_BATCH_MAX_KEYS", "5000"))
+
+# Кэш знаков пользователя (user_id → 12-битная маска)
+USER_SIGN_CACHE_SIZE = int(os.getenv("USER_SIGN_CACHE_SIZE", "100000"))
+USER_SIGN_CACHE_TTL_SECONDS = int(os.getenv("USER_SIGN_CACHE_TTL_SECONDS", "600"))
+# Общий для воркеров uvicorn бэкенд (Redis, нужен пакет redis). Пусто — только память процесса.
+USER_SIGN_CACHE_REDIS_URL = os.getenv("USER_SIGN_CACHE_REDIS_URL", "")
+# С общим бэкендом локальный слой живёт недолго: чужие записи видны не позже чем через столько секунд
+USER_SIGN_CACHE_LOCAL_TTL_SECONDS = int(os.getenv("USER_SIGN_CACHE_LOCAL_TTL_SECONDS", "5"))
+
+# Хранение знаков пользователя: "rows" — строки user_signs, "mask" — 12-битная маска
+# users.signs_mask, "dual" — пишем оба варианта, читаем строки (на время перехода).
+# Переход: rows → dual → python -m backend.migrations --backfill-signs-mask → mask
+SIGN_STORAGE_MODE = os.getenv("SIGN_STORAGE_MODE", "rows")
@@ -2,10 +2,18 @@
 
 import logging
 from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import Optional
 
+from .config import DEEPSEEK_RESPONSE_CACHE_KEEP_DAYS, GENERATION_HORIZON_DAYS, GENERATION_LANGS
 from .database import SessionLocal
-from .models import Horoscope
-from .deepseek_client import generate_daily
+from .deepseek_cache import prune_responses
+from .generation import GenerationKey, generate_many
+from .horoscope_store import save_horoscopes
+from .metrics import log_summary, stage_timer
+from .models import GenerationStatus, Horoscope
+from .zodiac import ZODIAC_SIGNS
+from .deepseek_client import close_session, generate_daily
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,38 +21,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Технические коды знаков, как в UserSign.sign и онбординге
-ZODIAC_SIGNS = [
-    "aries",
-    "taurus",
-    "gemini",
-    "cancer",
-    "leo",
-    "virgo",
-    "libra",
-    "scorpio",
-    "sagittarius",
-    "capricorn",
-    "aquarius",
-    "pisces",
-]
-
-# Русские названия для заголовков
-RUSSIAN_SIGN_NAMES = {
-    "aries": "Овен",
-    "taurus": "Телец",
-    "gemini": "Близнецы",
-    "cancer": "Рак",
-    "leo": "Лев",
-    "virgo": "Дева",
-    "libra": "Весы",
-    "scorpio": "Скорпион",
-    "sagittarius": "Стрелец",
-    "capricorn": "Козерог",
-    "aquarius": "Водолей",
-    "pisces": "Рыбы",
-}
-
 MOSCOW_TZ = timezone(timedelta(hours=3))
 
 
@@ -63,66 +39,124 @@ def get_moscow_today() -> date:
     return moscow_now.date()
 
 
-def make_horoscope_id(sign: str, lang: str, for_date: date) -> str:
-    """Детерминированный ID: например, 'aries_ru_2026-02-06'."""
-    return f"{sign}_{lang}_{for_date.isoformat()}"
-
+def generate_all_for_today(lang: str = "ru"):
+    """
+    Сгенерировать гороскопы на сегодняшнюю дату (по Москве) для всех знаков.
+    Это принудительный перезапуск: кэш ответов DeepSeek не читается, тексты новые.
+    Возвращает число сгенерированных и сохранённых гороскопов.
+    """
+    today = get_moscow_today()
+    logger.info("Generating horoscopes for %s (Moscow date), lang=%s", today.isoformat(), lang)
 
-def upsert_horoscope(db, sign: str, lang: str, for_date: date, text: str):
-    """Создать или обновить гороскоп для знака/даты/языка."""
-    obj = (
-        db.query(Horoscope)
-        .filter(
-            Horoscope.sign == sign,
-            Horoscope.date == for_date,
-            Horoscope.lang == lang,
-        )
-        .first()
-    )
+    # Тексты генерируем параллельно (с лимитом частоты), а пишем одной транзакцией в конце
+    keys = [(sign, lang, today) for sign in ZODIAC_SIGNS]
+    with stage_timer("generation", "generate"):
+        texts = generate_many(keys, partial(generate_daily, use_cache=False))
+    if len(texts) < len(keys):
+        logger.warning("Generated %d of %d horoscopes", len(texts), len(keys))
 
-    sign_ru = RUSSIAN_SIGN_NAMES.get(sign, sign)
-    title = f"{sign_ru}: гороскоп на {for_date.strftime('%d.%m.%Y')}"
-    h_id = make_horoscope_id(sign, lang, for_date)
+    db_gen = get_db()
+    db = next(db_gen)
 
-    if obj:
-        obj.title = title
-        obj.text = text
-    else:
-        obj = Horoscope(
-            id=h_id,
-            sign=sign,
-            date=for_date,
-            lang=lang,
-            title=title,
-            text=text,
-        )
-        db.add(obj)
+    try:
+        with stage_timer("generation", "commit"):
+            save_horoscopes(db, texts)
+        logger.info("Saved %d horoscopes", len(texts))
+    finally:
+        db_gen.close()
 
-    db.commit()
+    logger.info("Done generating horoscopes for %s (Moscow date)", today.isoformat())
+    return len(texts)
 
 
-def generate_all_for_today(lang: str = "ru"):
-    """Сгенерировать гороскопы на сегодняшнюю дату (по Москве) для всех знаков."""
-    today = get_moscow_today()
-    logger.info("Generating horoscopes for %s (Moscow date), lang=%s", today.isoformat(), lang)
+def existing_keys(db, langs: list[str], start: date, end: date) -> set[GenerationKey]:
+    """Какие (sign, lang, date) уже есть в horoscopes за период [start, end]."""
+    rows = db.query(Horoscope.sign, Horoscope.lang, Horoscope.date).filter(
+        Horoscope.lang.in_(langs),
+        Horoscope.date.between(start, end),
+    )
+    return {(r.sign, r.lang, r.date) for r in rows}
+
+
+def set_generation_status(db, key: GenerationKey, status: str, error: Optional[str] = None):
+    sign, lang, for_date = key
+    item = db.get(GenerationStatus, (sign, lang, for_date))
+    if item is None:
+        item = GenerationStatus(sign=sign, lang=lang, date=for_date, status=status, attempts=0)
+        db.add(item)
+    item.status = status
+    if status != "pending":
+        item.attempts = (item.attempts or 0) + 1
+        item.last_error = error
+
+
+def generate_horizon(
+    days: int = GENERATION_HORIZON_DAYS,
+    langs: Optional[list[str]] = None,
+):
+    """
+    Предгенерация на days дней вперёд (начиная с сегодня по Москве) для всех языков.
+    Уже существующие гороскопы пропускаются, поэтому перезапуск после падения
+    продолжает с места остановки. Пишем по одной транзакции на (дата, язык):
+    тексты и статусы в generation_status вместе.
+    """
+    langs = langs or GENERATION_LANGS
+    start = get_moscow_today()
+    end = start + timedelta(days=days - 1)
+    logger.info("Pre-generating horoscopes for %s..%s, langs=%s", start, end, langs)
 
     db_gen = get_db()
     db = next(db_gen)
 
     try:
-        for sign in ZODIAC_SIGNS:
-            try:
-                logger.info("Generating horoscope for sign=%s", sign)
-                text = generate_daily(sign=sign, lang=lang, for_date=today)
-                upsert_horoscope(db, sign=sign, lang=lang, for_date=today, text=text)
-                logger.info("Saved horoscope for %s", sign)
-            except Exception as e:
-                logger.exception("Failed to generate/save horoscope for %s: %s", sign, e)
+        # Кэш ответов DeepSeek нужен только для перезапусков — старые даты не пригодятся
+        with stage_timer("generation", "commit"):
+            pruned = prune_responses(db, start - timedelta(days=DEEPSEEK_RESPONSE_CACHE_KEEP_DAYS))
+            db.commit()
+        if pruned:
+            logger.info("Pruned %d cached DeepSeek responses", pruned)
+
+        with stage_timer("generation", "query"):
+            done = existing_keys(db, langs, start, end)
+        total = generated = 0
+        for offset in range(days):
+            for_date = start + timedelta(days=offset)
+            for lang in langs:
+                keys = [(sign, lang, for_date) for sign in ZODIAC_SIGNS]
+                todo = [k for k in keys if k not in done]
+                total += len(keys)
+                if not todo:
+                    continue
+
+                with stage_timer("generation", "commit"):
+                    for key in todo:
+                        set_generation_status(db, key, "pending")
+                    db.commit()
+
+                errors: dict[GenerationKey, str] = {}
+                with stage_timer("generation", "generate"):
+                    texts = generate_many(todo, generate_daily, errors=errors)
+
+                with stage_timer("generation", "commit"):
+                    for key in texts:
+                        set_generation_status(db, key, "done")
+                    for key, error in errors.items():
+                        set_generation_status(db, key, "failed", error)
+                    save_horoscopes(db, texts)
+                generated += len(texts)
+                logger.info(
+                    "%s/%s: generated %d, failed %d, skipped %d",
+                    for_date, lang, len(texts), len(errors), len(keys) - len(todo),
+                )
     finally:
         db_gen.close()
 
-    logger.info("Done generating horoscopes for %s (Moscow date)", today.isoformat())
+    logger.info("Pre-generation done: %d new of %d items", generated, total)
 
 
 if __name__ == "__main__":
-    generate_all_for_today(lang="ru")
+    try:
+        generate_horizon()
+    finally:
+        close_session()
+        log_summary(logger, "cron_fetch_horoscopes")
@@ -1,21 +1,97 @@
 import os
 import json
 import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, date, time, timedelta, timezone
+from multiprocessing import get_context
+from typing import Callable, Iterable, Iterator, Optional
+from uuid import UUID
 
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
+from .config import (
+    GENERATION_LANGS,
+    HOROSCOPE_STALE_MAX_DAYS,
+    PUSH_ACK_BATCH_SIZE,
+    PUSH_CLAIM_LEASE_MINUTES,
+    PUSH_NODE_INDEX,
+    PUSH_NODES,
+    PUSH_RETRY_BASE_MINUTES,
+    PUSH_RETRY_MAX_MINUTES,
+    PUSH_SEND_MODE,
+    PUSH_STREAM_CHUNK_SIZE,
+    PUSH_WORKERS,
+)
 from .database import SessionLocal
-from .models import UserDevice, UserSign, Horoscope
+from .fcm_transport import FcmTransport, SendResult, is_dead_token_error
+from .horoscope_cache import horoscope_cache
+from .metrics import FCM_MESSAGES, log_summary, stage_timer
+from .models import PUSH_SHARD_SLOTS, User, UserDevice, UserSign, Horoscope
+from .sign_storage import reads_mask, sign_bit
+from .zodiac import ZODIAC_SIGNS
 
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MOSCOW_TZ = timezone(timedelta(hours=3))
 
+PUSH_DATA = {"screen": "today"}
+
+
+@dataclass
+class PendingPush:
+    """Пуш, готовый к отправке: всё, что нужно транспорту и для отметки устройства."""
+
+    device_id: UUID
+    token: str
+    lang: str
+    body: str
+    # Временных ошибок подряд до этой попытки (для задержки следующего повтора)
+    failures: int = 0
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Часть устройств для одного воркера: push_shard mod count == index."""
+
+    index: int = 0
+    count: int = 1
+
+    def clause(self):
+        """
+        Условие шарда для WHERE: делит выборку в SQL, так что каждый из count воркеров
+        читает и группирует только свою долю. Слот хранится в user_devices.push_shard
+        и входит в индекс ix_user_devices_active_push_time.
+        """
+        return UserDevice.push_shard % self.count == self.index
+
+
+@dataclass
+class PushStats:
+    """Итоги рассылки: запуска, шарда или всех шардов вместе."""
+
+    due: int = 0
+    claimed: int = 0
+    sent: int = 0
+    # Временные ошибки (повтор по расписанию) и мёртвые токены (отмечены token_invalid_at)
+    failed: int = 0
+    dead: int = 0
+
+    def __add__(self, other: "PushStats") -> "PushStats":
+        return PushStats(
+            due=self.due + other.due,
+            claimed=self.claimed + other.claimed,
+            sent=self.sent + other.sent,
+            failed=self.failed + other.failed,
+            dead=self.dead + other.dead,
+        )
+
 
 def init_firebase():
     # Вариант 1: путь к файлу с ключом
@@ -46,31 +122,187 @@ def get_moscow_now() -> datetime:
     return utc_now.astimezone(MOSCOW_TZ)
 
 
-def is_within_window(now_ms: datetime, target: time, window_minutes: int = 10) -> bool:
-    """Проверяем, что текущее время в окне ±window_minutes от target."""
-    target_dt = datetime.combine(now_ms.date(), target, tzinfo=now_ms.tzinfo)
-    delta = abs((now_ms - target_dt).total_seconds()) / 60.0
-    return delta <= window_minutes
+@dataclass(frozen=True)
+class PushWindow:
+    """Отрезок push_time [start, end] внутри одних суток for_date (по Москве)."""
+
+    for_date: date
+    start: time
+    end: time
+
+
+def due_windows(now_ms: datetime, window_minutes: int = 10) -> list[PushWindow]:
+    """
+    Окно ±window_minutes вокруг текущего московского времени, разрезанное по полуночи.
+    Около полуночи получаем два отрезка: хвост одних суток и начало других,
+    и у каждого своя дата пуша (например, в 23:55 push_time 00:02 — это уже завтра).
+    """
+    start = now_ms - timedelta(minutes=window_minutes)
+    end = now_ms + timedelta(minutes=window_minutes)
+    if start.date() == end.date():
+        return [PushWindow(start.date(), start.time(), end.time())]
+    return [
+        PushWindow(start.date(), start.time(), time.max),
+        PushWindow(end.date(), time.min, end.time()),
+    ]
+
+
+def usable_horoscope_dates(for_date: date):
+    """Гороскопы, годные для рассылки на for_date: на саму дату или фолбэк не старше HOROSCOPE_STALE_MAX_DAYS."""
+    return Horoscope.date.between(for_date - timedelta(days=max(HOROSCOPE_STALE_MAX_DAYS, 0)), for_date)
+
+
+def due_pushes_query(window: PushWindow, now_utc: datetime, shard: Shard = Shard()):
+    """
+    Один запрос user_devices ⨝ user_signs (или users.signs_mask) ⨝ horoscopes (на дату окна
+    или, пока его нет, не старше HOROSCOPE_STALE_MAX_DAYS дней, на языке устройства)
+    с диапазоном по push_time в SQL — идёт по индексу ix_user_devices_active_push_time.
+    Устройства без знаков, без гороскопов за этот период, в чужой аренде или
+    с отложенным повтором (push_retry_at) в выборку не попадают.
+    На устройство одна строка с первым (по коду) знаком, на который есть гороскоп
+    на саму дату; устаревший знак берётся, только если свежих у устройства нет.
+    Превью зависит только от знака, сам текст берётся из preview_texts.
+    """
+    for_date = window.for_date
+
+    device_columns = (
+        UserDevice.id,
+        UserDevice.fcm_token,
+        UserDevice.lang,
+        UserDevice.push_failures,
+    )
+    sign = func.coalesce(
+        func.min(case((Horoscope.date == for_date, Horoscope.sign))),
+        func.min(Horoscope.sign),
+    )
+    stmt = select(*device_columns, sign.label("sign"))
+    if reads_mask():
+        # Знаки в users.signs_mask: гороскоп подходит, если его бит выставлен в маске
+        stmt = stmt.join(User, User.id == UserDevice.user_id).join(
+            Horoscope,
+            (User.signs_mask.op("&")(sign_bit(Horoscope.sign)) != 0)
+            & (Horoscope.lang == UserDevice.lang)
+            & usable_horoscope_dates(for_date),
+        )
+    else:
+        stmt = stmt.join(UserSign, UserSign.user_id == UserDevice.user_id).join(
+            Horoscope,
+            (Horoscope.sign == UserSign.sign)
+            & (Horoscope.lang == UserDevice.lang)
+            & usable_horoscope_dates(for_date),
+        )
 
+    if shard.count > 1:
+        stmt = stmt.where(shard.clause())
 
-def get_user_signs(db: Session, user_id):
-    rows = db.query(UserSign).filter(UserSign.user_id == user_id).all()
-    return [r.sign for r in rows]
+    return (
+        stmt
+        .where(
+            UserDevice.push_time.between(window.start, window.end),
+            UserDevice.is_active.is_(True),
+            UserDevice.token_invalid_at.is_(None),
+            UserDevice.fcm_token != "",
+            (UserDevice.last_push_date.is_(None) | (UserDevice.last_push_date != for_date)),
+            (UserDevice.push_claimed_until.is_(None) | (UserDevice.push_claimed_until < now_utc)),
+            (UserDevice.push_retry_at.is_(None) | (UserDevice.push_retry_at <= now_utc)),
+        )
+        .group_by(*device_columns)
+        .order_by(UserDevice.id)
+    )
 
 
-def get_today_horoscopes_for_signs(db: Session, signs, lang: str):
-    today = get_moscow_now().date()
-    return (
-        db.query(Horoscope)
-        .filter(
-            Horoscope.date == today,
-            Horoscope.lang == lang,
-            Horoscope.sign.in_(signs),
+def preview_texts(db: Session, for_date: date) -> dict[tuple[str, str], str]:
+    """
+    Превью пуша для каждого (sign, lang) на дату — считается один раз на окно,
+    а не на каждое устройство. Одинаковые превью — один и тот же объект str,
+    так что и пачки в send_pushes_batched собираются по готовым ключам.
+    Тексты — из того же HoroscopeCache, что у API, с тем же фолбэком на последний
+    более ранний текст, если на дату гороскопа ещё нет.
+    """
+    langs = db.execute(
+        select(Horoscope.lang)
+        .where(usable_horoscope_dates(for_date))
+        .distinct()
+    ).scalars().all()
+    previews = {}
+    for lang in langs:
+        for h in horoscope_cache.get_many(db, ZODIAC_SIGNS, lang, for_date, fallback=True):
+            previews[(h.sign, lang)] = build_preview_text([h])
+    return previews
+
+
+def missing_horoscopes(for_date: date, langs: Iterable[str] = GENERATION_LANGS) -> list[tuple[str, str]]:
+    """
+    (sign, lang), для которых нет гороскопа на дату рассылки: пуши по ним уйдут
+    с устаревшим превью. Рассылка сама не генерирует — это дело крона генерации
+    (generate_horizon), иначе медленный DeepSeek задерживал бы каждый запуск рассылки.
+    """
+    langs = list(langs)
+    with SessionLocal() as db:
+        present = set(
+            db.execute(
+                select(Horoscope.sign, Horoscope.lang).where(
+                    Horoscope.date == for_date, Horoscope.lang.in_(langs)
+                )
+            ).tuples()
         )
-        .all()
+    return [(sign, lang) for lang in langs for sign in ZODIAC_SIGNS if (sign, lang) not in present]
+
+
+def to_pending_push(row, previews: dict[tuple[str, str], str]) -> PendingPush:
+    return PendingPush(
+        device_id=row.id,
+        token=row.fcm_token,
+        lang=row.lang,
+        # Гороскоп мог появиться после preview_texts — тогда общий текст
+        body=previews.get((row.sign, row.lang)) or build_preview_text([]),
+        failures=row.push_failures or 0,
     )
 
 
+def iter_due_chunks(
+    db: Session,
+    window: PushWindow,
+    now_utc: datetime,
+    shard: Shard = Shard(),
+    chunk_size: int = PUSH_STREAM_CHUNK_SIZE,
+) -> Iterator[list[PendingPush]]:
+    """
+    Устройства шарда к рассылке пачками не больше chunk_size — в памяти только текущая пачка.
+    Строки (кортежи, не ORM-объекты) читаются серверным курсором (yield_per) на отдельном
+    соединении, поэтому коммиты аренды и отметок в db его не закрывают.
+    SQLite так не умеет (открытое чтение не даёт другому соединению закоммитить),
+    поэтому на нём, как и при chunk_size=0, выборка читается целиком.
+    """
+    with stage_timer("push", "build"):
+        previews = preview_texts(db, window.for_date)
+    stmt = due_pushes_query(window, now_utc, shard)
+    bind = db.get_bind()
+
+    def pushes(rows) -> list[PendingPush]:
+        with stage_timer("push", "build"):
+            return [to_pending_push(row, previews) for row in rows]
+
+    if chunk_size <= 0 or bind.dialect.name == "sqlite":
+        with stage_timer("push", "query"):
+            rows = db.execute(stmt).all()
+        size = chunk_size if chunk_size > 0 else max(len(rows), 1)
+        for start in range(0, len(rows), size):
+            yield pushes(rows[start:start + size])
+        return
+
+    with bind.connect() as conn:
+        with stage_timer("push", "query"):
+            partitions = conn.execution_options(yield_per=chunk_size).execute(stmt).partitions()
+        while True:
+            # Время выборки — это и время чтения каждой следующей пачки курсора
+            with stage_timer("push", "query"):
+                rows = next(partitions, None)
+            if rows is None:
+                break
+            yield pushes(rows)
+
+
 def build_preview_text(horoscopes):
     if not horoscopes:
         return "Ваш гороскоп на сегодня готов!"
@@ -82,85 +314,324 @@ def build_preview_text(horoscopes):
     return short
 
 
-def send_push_to_device(device: UserDevice, horoscopes, lang: str):
-    body = build_preview_text(horoscopes)
-    title = "Гороскоп на сегодня" if lang == "ru" else "Today’s horoscope"
-
-    message = messaging.Message(
-        token=device.fcm_token,
-        notification=messaging.Notification(
-            title=title,
-            body=body,
-        ),
-        data={
-            "screen": "today",
-        },
-    )
-    response = messaging.send(message)
-    logger.info(f"Sent push to device {device.id}, response: {response}")
-
+def push_title(lang: str) -> str:
+    return "Гороскоп на сегодня" if lang == "ru" else "Today’s horoscope"
+
+
+def send_pushes_single(
+    transport, pushes: Iterable[PendingPush]
+) -> Iterator[list[tuple[PendingPush, SendResult]]]:
+    """По одному вызову транспорта на устройство."""
+    for push in pushes:
+        with stage_timer("push", "send"):
+            result = transport.send(push.token, push_title(push.lang), push.body, PUSH_DATA)
+        yield [(push, result)]
+
+
+def send_pushes_batched(
+    transport, pushes: Iterable[PendingPush]
+) -> Iterator[list[tuple[PendingPush, SendResult]]]:
+    """
+    Группирует пуши с одинаковым payload (язык + текст превью) и шлёт их
+    пачками по transport.max_batch_size. Отдаёт результаты по каждой пачке.
+    Пачка уходит, как только наполнилась, остатки — в конце: pushes читается
+    потоком, и в памяти не больше одной неполной пачки на payload.
+    """
+    size = transport.max_batch_size
+    groups: dict[tuple[str, str], list[PendingPush]] = {}
+
+    def send(key: tuple[str, str], group: list[PendingPush]):
+        lang, body = key
+        with stage_timer("push", "send"):
+            results = transport.send_multicast(
+                [p.token for p in group], push_title(lang), body, PUSH_DATA
+            )
+        return list(zip(group, results))
+
+    for push in pushes:
+        key = (push.lang, push.body)
+        group = groups.setdefault(key, [])
+        group.append(push)
+        if len(group) >= size:
+            yield send(key, groups.pop(key))
+
+    for key, group in groups.items():
+        yield send(key, group)
+
+
+def retry_delay(failures: int) -> timedelta:
+    """Задержка перед повтором после failures временных ошибок подряд (1, 2, 3, ...)."""
+    minutes = PUSH_RETRY_BASE_MINUTES * 2 ** (failures - 1)
+    return timedelta(minutes=min(minutes, PUSH_RETRY_MAX_MINUTES))
+
+
+def claim_devices(
+    db: Session,
+    device_ids: list[UUID],
+    run_id: str,
+    now_utc: datetime,
+    for_date: date,
+    lease_minutes: int = PUSH_CLAIM_LEASE_MINUTES,
+) -> set[UUID]:
+    """
+    Берёт устройства в аренду для запуска run_id одним UPDATE и возвращает те,
+    что достались именно ему. Параллельный запуск не возьмёт устройство,
+    пока аренда не истекла или пока оно не отмечено как отправленное на for_date.
+    """
+    with stage_timer("push", "claim"):
+        db.query(UserDevice).filter(
+            UserDevice.id.in_(device_ids),
+            (UserDevice.push_claimed_until.is_(None) | (UserDevice.push_claimed_until < now_utc)),
+            (UserDevice.last_push_date.is_(None) | (UserDevice.last_push_date != for_date)),
+        ).update(
+            {
+                UserDevice.push_claim_id: run_id,
+                UserDevice.push_claimed_until: now_utc + timedelta(minutes=lease_minutes),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
 
-def process_pushes():
+        rows = db.query(UserDevice.id).filter(
+            UserDevice.id.in_(device_ids),
+            UserDevice.push_claim_id == run_id,
+        )
+        return {r.id for r in rows}
+
+
+class PushAckBuffer:
+    """
+    Копит результаты отправки и отмечает устройства пачками (UPDATE ... WHERE id IN):
+    - отправленным ставим last_push_date и сбрасываем счётчик ошибок;
+    - после временной ошибки увеличиваем push_failures и откладываем повтор до push_retry_at;
+    - мёртвым токенам ставим token_invalid_at, чтобы не слать на них каждый запуск
+      (is_active — выбор пользователя, его не трогаем; register_device с тем же токеном
+      снимает отметку).
+    Со всех снимаем аренду. Если процесс упадёт до flush, аренда остаётся до истечения
+    и повтора в этом окне не будет.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        run_id: str,
+        for_date: date,
+        now_utc: datetime,
+        batch_size: int = PUSH_ACK_BATCH_SIZE,
+    ):
+        self.db = db
+        self.run_id = run_id
+        self.for_date = for_date
+        self.now_utc = now_utc
+        self.batch_size = batch_size
+        self.sent: list[UUID] = []
+        self.dead: list[UUID] = []
+        # Время повтора → устройства (одинаковое у устройств с одинаковым числом ошибок)
+        self.retry: dict[datetime, list[UUID]] = {}
+        self.pending = 0
+        self.acked = 0
+
+    def ack(self, device_id: UUID):
+        self.sent.append(device_id)
+        self._added()
+
+    def release(self, device_id: UUID, failures: int):
+        """Временная ошибка: failures — сколько ошибок подряд было до этой."""
+        retry_at = self.now_utc + retry_delay(failures + 1)
+        self.retry.setdefault(retry_at, []).append(device_id)
+        self._added()
+
+    def invalidate_token(self, device_id: UUID):
+        self.dead.append(device_id)
+        self._added()
+
+    def _added(self):
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def _update(self, device_ids: list[UUID], values: dict):
+        released = {UserDevice.push_claim_id: None, UserDevice.push_claimed_until: None}
+        self.db.query(UserDevice).filter(
+            UserDevice.id.in_(device_ids),
+            UserDevice.push_claim_id == self.run_id,
+        ).update({**values, **released}, synchronize_session=False)
+
+    def flush(self):
+        if not self.pending:
+            return
+        with stage_timer("push", "commit"):
+            reset = {UserDevice.push_failures: None, UserDevice.push_retry_at: None}
+            if self.sent:
+                self._update(self.sent, {UserDevice.last_push_date: self.for_date, **reset})
+            for retry_at, device_ids in self.retry.items():
+                self._update(
+                    device_ids,
+                    {
+                        UserDevice.push_failures: func.coalesce(UserDevice.push_failures, 0) + 1,
+                        UserDevice.push_retry_at: retry_at,
+                    },
+                )
+            if self.dead:
+                self._update(self.dead, {UserDevice.token_invalid_at: self.now_utc, **reset})
+            self.db.commit()
+            self.acked += len(self.sent)
+            self.sent = []
+            self.dead = []
+            self.retry = {}
+            self.pending = 0
+
+
+def process_pushes(
+    transport=None, mode: str = PUSH_SEND_MODE, shard: Shard = Shard()
+) -> PushStats:
+    transport = transport or FcmTransport()
     moscow_now = get_moscow_now()
-    logger.info(f"Moscow time now: {moscow_now.isoformat()}")
+    run_id = str(uuid.uuid4())
+    logger.info(
+        f"Moscow time now: {moscow_now.isoformat()}, send mode: {mode}, "
+        f"shard: {shard.index}/{shard.count}, run: {run_id}"
+    )
 
-    today = moscow_now.date()
+    now_utc = moscow_now.astimezone(timezone.utc)
+    stats = PushStats()
     db: Session = SessionLocal()
     try:
-        # Берём только активные устройства, которым ещё не слали сегодня
-        devices = (
-            db.query(UserDevice)
-            .filter(
-                UserDevice.is_active.is_(True),
-                UserDevice.fcm_token != "",
-                (UserDevice.last_push_date.is_(None) | (UserDevice.last_push_date != today)),
-            )
-            .all()
-        )
-        logger.info(f"Found {len(devices)} devices eligible for push")
-
-        for device in devices:
-            if not device.push_time:
-                continue
-
-            # Окно ±10 минут вокруг push_time
-            if not is_within_window(moscow_now, device.push_time, window_minutes=10):
-                logger.info(
-                    "Skip device %s: outside window (now=%s, push_time=%s)",
-                    device.id,
-                    moscow_now.time(),
-                    device.push_time,
-                )
+        for window in due_windows(moscow_now, window_minutes=10):
+            stats += process_window(db, transport, mode, window, run_id, now_utc, shard)
+    finally:
+        db.close()
+    return stats
+
+
+def process_window(
+    db: Session,
+    transport,
+    mode: str,
+    window: PushWindow,
+    run_id: str,
+    now_utc: datetime,
+    shard: Shard = Shard(),
+) -> PushStats:
+    """
+    Рассылка по одному отрезку окна потоком: пачка выборки → аренда → отправка → отметка.
+    Память не растёт с числом устройств: держим текущую пачку и неполные группы multicast.
+    """
+    stats = PushStats()
+
+    def claimed_pushes() -> Iterator[PendingPush]:
+        # Активные устройства шарда с push_time в отрезке, которым ещё не слали на эту дату
+        for chunk in iter_due_chunks(db, window, now_utc, shard):
+            if not chunk:
                 continue
+            stats.due += len(chunk)
+            claimed = claim_devices(db, [p.device_id for p in chunk], run_id, now_utc, window.for_date)
+            stats.claimed += len(claimed)
+            yield from (p for p in chunk if p.device_id in claimed)
 
+    send = send_pushes_batched if mode == "batch" else send_pushes_single
+    acks = PushAckBuffer(db, run_id, window.for_date, now_utc)
+    try:
+        for chunk in send(transport, claimed_pushes()):
+            for push, result in chunk:
+                if result.success:
+                    FCM_MESSAGES.inc(outcome="sent")
+                    acks.ack(push.device_id)
+                elif is_dead_token_error(result.exception):
+                    FCM_MESSAGES.inc(outcome="dead")
+                    logger.info(
+                        "Marking token of device %s invalid: %s", push.device_id, result.exception
+                    )
+                    stats.dead += 1
+                    acks.invalidate_token(push.device_id)
+                else:
+                    FCM_MESSAGES.inc(outcome="failed")
+                    logger.error(
+                        "Failed to send push to device %s: %s", push.device_id, result.exception
+                    )
+                    stats.failed += 1
+                    acks.release(push.device_id, push.failures)
+    finally:
+        acks.flush()
+    stats.sent = acks.acked
+    if stats.claimed < stats.due:
+        logger.info(f"{stats.due - stats.claimed} devices are claimed by another run, skipped")
+    logger.info(
+        f"Window {window.for_date.isoformat()} {window.start}–{window.end}: "
+        f"{stats.due} devices due, sent {acks.acked}/{stats.claimed} pushes, "
+        f"{stats.failed} scheduled for retry, {stats.dead} dead tokens marked invalid"
+    )
+    return stats
+
+
+def run_shard(
+    shard: Shard, mode: str = PUSH_SEND_MODE, transport_factory: Optional[Callable] = None
+) -> PushStats:
+    """
+    Точка входа воркера: свой процесс, свой пул соединений к БД и своё
+    приложение firebase_admin (со своим HTTP-пулом к FCM).
+    transport_factory — для прогонов без FCM (например, FakeFcmTransport).
+    """
+    logging.basicConfig(level=logging.INFO)
+    if transport_factory is None:
+        init_firebase()
+        transport = FcmTransport()
+    else:
+        transport = transport_factory()
+    stats = process_pushes(transport, mode, shard)
+    log_summary(logger, f"Shard {shard.index}/{shard.count}")
+    return stats
+
+
+def dispatch_sharded(
+    workers: int = PUSH_WORKERS,
+    nodes: int = PUSH_NODES,
+    node_index: int = PUSH_NODE_INDEX,
+    mode: str = PUSH_SEND_MODE,
+    transport_factory: Optional[Callable] = None,
+) -> PushStats:
+    """
+    Запускает workers процессов, каждый со своим шардом из nodes × workers.
+    Шарды не пересекаются, а аренда устройств (claim_devices) страхует от двойной
+    отправки, даже если узлы запущены с несогласованными PUSH_NODES/PUSH_NODE_INDEX.
+    """
+    if not 0 <= node_index < nodes:
+        raise ValueError(f"PUSH_NODE_INDEX must be in [0, {nodes}), got {node_index}")
+    if nodes * workers > PUSH_SHARD_SLOTS:
+        raise ValueError(f"PUSH_NODES × PUSH_WORKERS must not exceed {PUSH_SHARD_SLOTS}")
+
+    shards = [Shard(node_index * workers + w, nodes * workers) for w in range(workers)]
+    total = PushStats()
+    # spawn: воркер не наследует пул соединений и состояние firebase_admin родителя
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        futures = [pool.submit(run_shard, shard, mode, transport_factory) for shard in shards]
+        for shard, future in zip(shards, futures):
             try:
-                signs = get_user_signs(db, device.user_id)
-                if not signs:
-                    logger.info(f"No signs for user {device.user_id}, skip")
-                    continue
-
-                horoscopes = get_today_horoscopes_for_signs(db, signs, device.lang)
-                if not horoscopes:
-                    logger.info(f"No horoscopes for user {device.user_id} today, skip")
-                    continue
-
-                send_push_to_device(device, horoscopes, device.lang)
-
-                device.last_push_date = today
-                db.add(device)
-                db.commit()
+                stats = future.result()
             except Exception as e:
-                db.rollback()
-                logger.exception(f"Failed to send push to device {device.id}: {e}")
-    finally:
-        db.close()
+                logger.exception(f"Shard {shard.index}/{shard.count} failed: {e}")
+                continue
+            logger.info(f"Shard {shard.index}/{shard.count}: {stats}")
+            total += stats
+    return total
 
 
 def main():
     logger.info("cron_send_pushes started")
-    init_firebase()
-    process_pushes()
-    logger.info("cron_send_pushes finished")
+    for window in due_windows(get_moscow_now()):
+        missing = missing_horoscopes(window.for_date)
+        if missing:
+            logger.warning(
+                f"{len(missing)} horoscopes for {window.for_date} are missing, sending stale previews: "
+                + ", ".join(f"{sign}/{lang}" for sign, lang in missing)
+            )
+    if PUSH_WORKERS > 1 or PUSH_NODES > 1:
+        stats = dispatch_sharded()
+    else:
+        init_firebase()
+        stats = process_pushes()
+        log_summary(logger, "cron_send_pushes")
+    logger.info(f"cron_send_pushes finished: {stats}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,67 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import DATABASE_URL
+from .config import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE
+from .metrics import instrument_engine
 
-engine = create_engine(DATABASE_URL, future=True)
+
+def pool_options(url: str) -> dict:
+    # У SQLite свой пул без pool_size/max_overflow
+    if url.startswith("sqlite"):
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_pre_ping": True}
+
+
+engine = create_engine(DATABASE_URL, future=True, **pool_options(DATABASE_URL))
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def upsert_insert(db):
+    """
+    insert() с ON CONFLICT для диалекта сессии (PostgreSQL, SQLite) или None,
+    если диалект его не поддерживает — тогда вызывающий делает построчный fallback.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def make_async_url(url: str) -> str:
+    """postgresql://… → postgresql+asyncpg://…, sqlite://… → sqlite+aiosqlite://…"""
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0]
+    if driver in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+# Async-движок создаём лениво: драйверы (asyncpg/aiosqlite) нужны только при DB_ASYNC=1
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker | None = None
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        url = make_async_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, **pool_options(url))
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
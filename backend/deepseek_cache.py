@@ -0,0 +1,170 @@
+# backend/deepseek_cache.py
+#
+# Ответы DeepSeek без повторной оплаты: single-flight для одинаковых запросов «в полёте»
+# и постоянный кэш в таблице deepseek_responses по (sign, lang, date, хэш промпта).
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import date
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .config import DEEPSEEK_RESPONSE_CACHE
+from .database import SessionLocal, upsert_insert
+from .models import DeepseekResponse
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_hash(payload: dict) -> str:
+    """SHA-256 тела запроса к API (модель, параметры, сообщения) — меняется вместе с промптом."""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Одинаковые вызовы, пришедшие, пока первый ещё выполняется, ждут его результат
+    (или исключение) вместо собственного вызова. Завершённые вызовы не запоминаются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], str]) -> str:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class ResponseCache:
+    """
+    Кэш ответов DeepSeek: single-flight внутри процесса + таблица deepseek_responses
+    на все процессы и перезапуски. Ошибки БД кэша не роняют генерацию — вызов
+    просто идёт в API (текст дороже строки кэша).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        enabled: bool = DEEPSEEK_RESPONSE_CACHE,
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self._flight = SingleFlight()
+
+    def get_or_call(
+        self,
+        sign: str,
+        lang: str,
+        for_date: date,
+        payload: dict,
+        call: Callable[[], str],
+        use_cache: bool = True,
+    ) -> str:
+        """
+        use_cache=False — принудительная перегенерация: сохранённый ответ не читается,
+        API вызывается заново, а новый текст заменяет строку кэша.
+        """
+        key = (sign, lang, for_date, prompt_hash(payload))
+        return self._flight.do((key, use_cache), lambda: self._load_or_call(key, call, use_cache))
+
+    def _load_or_call(self, key: tuple, call: Callable[[], str], use_cache: bool) -> str:
+        if self.enabled and use_cache:
+            text = self._load(key)
+            if text is not None:
+                logger.info("DeepSeek response for %s/%s/%s taken from cache", *key[:3])
+                return text
+        text = call()
+        if self.enabled:
+            self._store(key, text, replace=not use_cache)
+        return text
+
+    def _load(self, key: tuple) -> Optional[str]:
+        sign, lang, for_date, phash = key
+        try:
+            with self.session_factory() as db:
+                return db.execute(
+                    select(DeepseekResponse.text).where(
+                        DeepseekResponse.sign == sign,
+                        DeepseekResponse.lang == lang,
+                        DeepseekResponse.date == for_date,
+                        DeepseekResponse.prompt_hash == phash,
+                    )
+                ).scalar()
+        except SQLAlchemyError as e:
+            logger.warning("DeepSeek response cache read failed: %s", e)
+            return None
+
+    def _store(self, key: tuple, text: str, replace: bool = False):
+        sign, lang, for_date, phash = key
+        row = {"sign": sign, "lang": lang, "date": for_date, "prompt_hash": phash, "text": text}
+        try:
+            with self.session_factory() as db:
+                upsert = upsert_insert(db)
+                if upsert is None:
+                    if replace:
+                        db.execute(
+                            delete(DeepseekResponse).where(
+                                DeepseekResponse.sign == sign,
+                                DeepseekResponse.lang == lang,
+                                DeepseekResponse.date == for_date,
+                                DeepseekResponse.prompt_hash == phash,
+                            )
+                        )
+                    try:
+                        db.execute(insert(DeepseekResponse).values(row))
+                        db.commit()
+                    except IntegrityError:
+                        # Тот же промпт уже сохранил другой процесс
+                        db.rollback()
+                    return
+                stmt = upsert(DeepseekResponse).values(row)
+                if replace:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[
+                            DeepseekResponse.sign,
+                            DeepseekResponse.lang,
+                            DeepseekResponse.date,
+                            DeepseekResponse.prompt_hash,
+                        ],
+                        set_={"text": stmt.excluded.text},
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing()
+                db.execute(stmt)
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("DeepSeek response cache write failed: %s", e)
+
+
+def prune_responses(db: Session, before: date) -> int:
+    """Удалить ответы на даты раньше before (без коммита). Возвращает число строк."""
+    return db.execute(delete(DeepseekResponse).where(DeepseekResponse.date < before)).rowcount
+
+
+# Общий экземпляр на процесс
+response_cache = ResponseCache()
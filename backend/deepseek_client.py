@@ -1,9 +1,15 @@
 # backend/deepseek_client.py
 
 import os
+import threading
 from datetime import date
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from .config import DEEPSEEK_POOL_SIZE
+from .deepseek_cache import response_cache
+from .metrics import external_call
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
@@ -13,8 +19,33 @@ DEEPSEEK_API_URL = os.getenv(
     "https://api.deepseek.com/v1/chat/completions"
 )
 
-if not DEEPSEEK_API_KEY:
-    raise RuntimeError("DEEPSEEK_API_KEY is not set in environment variables")
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Общая на процесс сессия с пулом keep-alive соединений: TCP+TLS рукопожатие
+    один раз на соединение, а не на каждый запрос. Потокобезопасна для generate_many.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DEEPSEEK_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def close_session():
+    """Закрыть пул соединений (в конце крона)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
 
 
 HOROSCOPE_SYSTEM_PROMPT_RU = """
@@ -38,45 +69,102 @@ HOROSCOPE_SYSTEM_PROMPT_RU = """
 """.strip()
 
 
+def build_chat_payload(system_prompt: str, messages: list[dict]) -> dict:
+    return {
+        "model": DEEPSEEK_MODEL,
+        "messages": [{"role": "system", "content": system_prompt}] + messages,
+        "temperature": 0.7,
+    }
+
+
 def _call_deepseek_chat(system_prompt: str, messages: list[dict]) -> str:
     """
     Базовый вызов DeepSeek Chat API (OpenAI‑совместимый).
     Возвращает content из первого choice.
     """
+    # Проверяем ключ при вызове, а не при импорте: модули крона импортируются
+    # и там, где генерация не нужна (бенчмарки, миграции)
+    if not DEEPSEEK_API_KEY:
+        raise RuntimeError("DEEPSEEK_API_KEY is not set in environment variables")
+
     headers = {
         "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
         "Content-Type": "application/json",
     }
-    payload = {
-        "model": DEEPSEEK_MODEL,
-        "messages": [{"role": "system", "content": system_prompt}] + messages,
-        "temperature": 0.7,
-    }
+    payload = build_chat_payload(system_prompt, messages)
 
-    resp = requests.post(DEEPSEEK_API_URL, json=payload, headers=headers, timeout=40)
-    resp.raise_for_status()
-    data = resp.json()
+    with external_call("deepseek", "chat"):
+        resp = get_session().post(DEEPSEEK_API_URL, json=payload, headers=headers, timeout=40)
+        resp.raise_for_status()
+        data = resp.json()
     return data["choices"][0]["message"]["content"]
 
 
-def generate_daily(sign: str, lang: str, for_date: date) -> str:
-    """
-    Генерация текста гороскопа для конкретного знака, языка и даты.
-    Пока реализуем только 'ru', но lang оставляем на будущее.
-    """
-    if lang != "ru":
-        # На первом этапе поддерживаем только русские тексты
-        raise ValueError(f"Only 'ru' is supported for now, got lang={lang!r}")
+HOROSCOPE_SYSTEM_PROMPT_EN = """
+You are an astrologer who writes daily horoscopes in ENGLISH.
+
+Style:
+- Light humour and positivity, but no clowning around.
+- No negativity or scaremongering; do not mention illness, politics or money directly.
+- A friendly, supportive tone, like a good friend who inspires.
+
+Format:
+- 2–3 paragraphs of 2–3 sentences each.
+- The first paragraph sets the overall mood and the main idea of the day.
+- The second gives short tips on work, communication and mood.
+- One light joke or ironic observation is welcome.
+
+Restrictions:
+- Do not give medical, legal or financial advice.
+- Do not use aggressive wording.
+- Do not mention that the text is AI-generated.
+""".strip()
+
+SYSTEM_PROMPTS = {
+    "ru": HOROSCOPE_SYSTEM_PROMPT_RU,
+    "en": HOROSCOPE_SYSTEM_PROMPT_EN,
+}
 
-    user_prompt = (
-        f"Сегодняшняя дата: {for_date.isoformat()}.\n"
+SUPPORTED_LANGS = tuple(SYSTEM_PROMPTS)
+
+
+def build_user_prompt(sign: str, lang: str, for_date: date) -> str:
+    if lang == "en":
+        return (
+            f"Date: {for_date.isoformat()}.\n"
+            f"Zodiac sign: {sign}.\n\n"
+            "Write the horoscope for this day following the rules above. "
+            "Do not repeat the sign name at the beginning, go straight to the text."
+        )
+    return (
+        f"Дата гороскопа: {for_date.isoformat()}.\n"
         f"Знак зодиака: {sign}.\n\n"
-        "Сгенерируй гороскоп на сегодняшний день по указанным правилам. "
+        "Сгенерируй гороскоп на этот день по указанным правилам. "
         "Не дублируй название знака в начале, просто сразу переходи к тексту."
     )
 
+
+def generate_daily(sign: str, lang: str, for_date: date, use_cache: bool = True) -> str:
+    """
+    Генерация текста гороскопа для конкретного знака, языка и даты.
+    Поддерживаются языки из SYSTEM_PROMPTS.
+    Одинаковые параллельные вызовы делят один запрос к API, а уже полученный
+    ответ на тот же промпт берётся из deepseek_responses (см. deepseek_cache).
+    use_cache=False — всегда новый вызов API (ручной перезапуск генерации).
+    """
+    if lang not in SYSTEM_PROMPTS:
+        raise ValueError(f"Unsupported lang={lang!r}, expected one of {SUPPORTED_LANGS}")
+
     messages = [
-        {"role": "user", "content": user_prompt}
+        {"role": "user", "content": build_user_prompt(sign, lang, for_date)}
     ]
 
-    return _call_deepseek_chat(HOROSCOPE_SYSTEM_PROMPT_RU, messages)
+    system_prompt = SYSTEM_PROMPTS[lang]
+    return response_cache.get_or_call(
+        sign,
+        lang,
+        for_date,
+        build_chat_payload(system_prompt, messages),
+        lambda: _call_deepseek_chat(system_prompt, messages),
+        use_cache=use_cache,
+    )
@@ -0,0 +1,158 @@
+# backend/fcm_transport.py
+
+import logging
+import threading
+import time as time_mod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from firebase_admin import exceptions, messaging
+
+from .metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+# Лимит FCM на один вызов send_each / send_each_for_multicast
+FCM_MAX_BATCH_SIZE = 500
+
+
+@dataclass
+class SendResult:
+    """Результат отправки на один токен."""
+
+    token: str
+    success: bool
+    message_id: Optional[str] = None
+    exception: Optional[Exception] = None
+
+
+def is_dead_token_error(exc: Optional[Exception]) -> bool:
+    """
+    Ошибка, после которой токен уже не примет сообщений: приложение удалено,
+    токен отозван или выдан другому sender id. Остальные ошибки считаем временными.
+    """
+    if isinstance(exc, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return True
+    # INVALID_ARGUMENT бывает и из-за payload — токен виноват, только если FCM пишет о нём
+    if isinstance(exc, exceptions.InvalidArgumentError):
+        return "registration token" in str(exc).lower()
+    return False
+
+
+@lru_cache(maxsize=1024)
+def notification(title: str, body: str) -> messaging.Notification:
+    """
+    Общий объект Notification на (title, body): превью одинаковы у всех устройств
+    с тем же знаком и языком, поэтому payload собирается один раз на рассылку.
+    """
+    return messaging.Notification(title=title, body=body)
+
+
+class FcmTransport:
+    """Отправка через firebase_admin.messaging (приложение должно быть инициализировано)."""
+
+    max_batch_size = FCM_MAX_BATCH_SIZE
+
+    def send(self, token: str, title: str, body: str, data: dict) -> SendResult:
+        message = messaging.Message(
+            token=token,
+            notification=notification(title, body),
+            data=data,
+        )
+        try:
+            with external_call("fcm", "send"):
+                message_id = messaging.send(message)
+        except Exception as e:
+            return SendResult(token=token, success=False, exception=e)
+        return SendResult(token=token, success=True, message_id=message_id)
+
+    def send_multicast(
+        self, tokens: list[str], title: str, body: str, data: dict
+    ) -> list[SendResult]:
+        """Один и тот же payload на список токенов (не больше max_batch_size)."""
+        message = messaging.MulticastMessage(
+            tokens=tokens,
+            notification=notification(title, body),
+            data=data,
+        )
+        try:
+            with external_call("fcm", "send_multicast"):
+                batch = messaging.send_each_for_multicast(message)
+        except Exception as e:
+            # Упал весь вызов — считаем неуспешными все токены пачки
+            logger.exception("Multicast send failed for %d tokens: %s", len(tokens), e)
+            return [SendResult(token=t, success=False, exception=e) for t in tokens]
+
+        return [
+            SendResult(
+                token=token,
+                success=resp.success,
+                message_id=resp.message_id,
+                exception=resp.exception,
+            )
+            for token, resp in zip(tokens, batch.responses)
+        ]
+
+
+class FakeFcmTransport:
+    """
+    Транспорт без сети для бенчмарков и локальных прогонов.
+    call_latency — задержка на один HTTP-вызов, message_latency — на каждое сообщение в нём.
+    Токены из fail_tokens возвращаются с временной ошибкой, из dead_tokens — с UnregisteredError.
+    """
+
+    max_batch_size = FCM_MAX_BATCH_SIZE
+
+    def __init__(
+        self,
+        call_latency: float = 0.0,
+        message_latency: float = 0.0,
+        fail_tokens: Optional[set[str]] = None,
+        dead_tokens: Optional[set[str]] = None,
+    ):
+        self.call_latency = call_latency
+        self.message_latency = message_latency
+        self.fail_tokens = fail_tokens or set()
+        self.dead_tokens = dead_tokens or set()
+        self.calls = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def send(self, token: str, title: str, body: str, data: dict) -> SendResult:
+        return self.send_multicast([token], title, body, data)[0]
+
+    def send_multicast(
+        self, tokens: list[str], title: str, body: str, data: dict
+    ) -> list[SendResult]:
+        if len(tokens) > self.max_batch_size:
+            raise ValueError(f"Batch too large: {len(tokens)} > {self.max_batch_size}")
+
+        delay = self.call_latency + self.message_latency * len(tokens)
+        if delay:
+            time_mod.sleep(delay)
+
+        with self._lock:
+            self.calls += 1
+            self.messages += len(tokens)
+            seq = self.messages
+
+        results = []
+        for i, token in enumerate(tokens):
+            if token in self.dead_tokens:
+                results.append(
+                    SendResult(
+                        token=token,
+                        success=False,
+                        exception=messaging.UnregisteredError("Requested entity was not found."),
+                    )
+                )
+            elif token in self.fail_tokens:
+                results.append(
+                    SendResult(token=token, success=False, exception=RuntimeError("fake failure"))
+                )
+            else:
+                results.append(
+                    SendResult(token=token, success=True, message_id=f"fake/{seq - len(tokens) + i}")
+                )
+        return results
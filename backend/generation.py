@@ -0,0 +1,119 @@
+# backend/generation.py
+#
+# Параллельная генерация текстов: пул потоков, token bucket и повторы с джиттером.
+
+import logging
+import random
+import threading
+import time as time_mod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from typing import Callable, Iterable, Optional
+
+import requests
+
+from .config import (
+    DEEPSEEK_BACKOFF_BASE,
+    DEEPSEEK_CONCURRENCY,
+    DEEPSEEK_MAX_ATTEMPTS,
+    DEEPSEEK_RATE_BURST,
+    DEEPSEEK_RATE_PER_SEC,
+)
+
+logger = logging.getLogger(__name__)
+
+# (sign, lang, date)
+GenerationKey = tuple[str, str, date]
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate токенов в секунду, не больше burst в запасе."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time_mod.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Блокирует, пока не появится токен."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time_mod.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time_mod.sleep(wait)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429, 5xx и сетевые ошибки стоит повторить, остальное — нет."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def call_with_retry(
+    fn: Callable[[], str],
+    bucket: Optional[TokenBucket] = None,
+    max_attempts: int = DEEPSEEK_MAX_ATTEMPTS,
+    backoff_base: float = DEEPSEEK_BACKOFF_BASE,
+) -> str:
+    """Вызов fn с ограничением частоты и повторами (full jitter: sleep ∈ [0, base·2^n])."""
+    attempt = 0
+    while True:
+        attempt += 1
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_attempts or not is_retryable(e):
+                raise
+            delay = random.uniform(0, backoff_base * 2 ** (attempt - 1))
+            logger.warning("Attempt %d failed (%s), retry in %.1fs", attempt, e, delay)
+            time_mod.sleep(delay)
+
+
+def generate_many(
+    keys: Iterable[GenerationKey],
+    generate: Callable[[str, str, date], str],
+    concurrency: int = DEEPSEEK_CONCURRENCY,
+    bucket: Optional[TokenBucket] = None,
+    errors: Optional[dict[GenerationKey, str]] = None,
+) -> dict[GenerationKey, str]:
+    """
+    Генерирует тексты для всех ключей в пуле из concurrency потоков.
+    Возвращает только успешные результаты; ошибки логируются
+    и, если передан словарь errors, складываются в него.
+    """
+    if bucket is None:
+        bucket = TokenBucket(DEEPSEEK_RATE_PER_SEC, DEEPSEEK_RATE_BURST)
+
+    results: dict[GenerationKey, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(
+                call_with_retry,
+                lambda k=key: generate(sign=k[0], lang=k[1], for_date=k[2]),
+                bucket,
+            ): key
+            for key in keys
+        }
+        for future in as_completed(futures):
+            sign, lang, for_date = key = futures[future]
+            try:
+                results[key] = future.result()
+                logger.info("Generated horoscope for %s/%s/%s", sign, lang, for_date.isoformat())
+            except Exception as e:
+                logger.error("Failed to generate horoscope for %s/%s/%s: %s", sign, lang, for_date, e)
+                if errors is not None:
+                    errors[key] = str(e) or type(e).__name__
+    return results
@@ -0,0 +1,177 @@
+# backend/horoscope_cache.py
+
+import threading
+import time as time_mod
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .config import HOROSCOPE_CACHE_TTL_SECONDS, HOROSCOPE_STALE_MAX_DAYS
+from .models import Horoscope
+
+
+@dataclass(frozen=True)
+class CachedHoroscope:
+    """Отвязанная от сессии копия строки Horoscope."""
+
+    id: str
+    sign: str
+    date: date
+    lang: str
+    title: Optional[str]
+    text: str
+
+
+def _detached(h: Horoscope) -> CachedHoroscope:
+    return CachedHoroscope(id=h.id, sign=h.sign, date=h.date, lang=h.lang, title=h.title, text=h.text)
+
+
+class HoroscopeCache:
+    """
+    Кэш гороскопов в памяти процесса, ключ — (sign, lang, date).
+    - Держит только одну дату: при запросе другой даты кэш сбрасывается целиком.
+    - Запись живёт не дольше ttl_seconds (обновления из крона в другом процессе).
+    - Отсутствующие в БД гороскопы не кэшируются, чтобы новые тексты появились сразу.
+    - Фолбэк (fallback=True): для знаков без текста на дату — последний текст по
+      (sign, lang) не старше stale_max_days из индекса _latest (он переживает смену даты).
+      У такой записи date меньше запрошенной — это и есть признак устаревшего текста.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = HOROSCOPE_CACHE_TTL_SECONDS,
+        stale_max_days: int = HOROSCOPE_STALE_MAX_DAYS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_max_days = stale_max_days
+        self._lock = threading.Lock()
+        self._date: Optional[date] = None
+        self._items: dict[tuple[str, str, date], tuple[float, CachedHoroscope]] = {}
+        self._latest: dict[tuple[str, str], tuple[float, CachedHoroscope]] = {}
+
+    def get_many(
+        self,
+        db: Session,
+        signs: Iterable[str],
+        lang: str,
+        for_date: date,
+        fallback: bool = False,
+    ) -> list[CachedHoroscope]:
+        """
+        Гороскопы для знаков в порядке signs; промахи добираем одним запросом.
+        fallback=True — знаки без текста на for_date получают последний более ранний.
+        """
+        signs = list(dict.fromkeys(signs))
+        now = time_mod.monotonic()
+        found: dict[str, CachedHoroscope] = {}
+        missing: list[str] = []
+
+        with self._lock:
+            self._roll_date(for_date)
+            for sign in signs:
+                entry = self._items.get((sign, lang, for_date))
+                if entry is not None and now - entry[0] < self.ttl_seconds:
+                    found[sign] = entry[1]
+                else:
+                    missing.append(sign)
+
+        if missing:
+            rows = (
+                db.query(Horoscope)
+                .filter(
+                    Horoscope.date == for_date,
+                    Horoscope.lang == lang,
+                    Horoscope.sign.in_(missing),
+                )
+                .all()
+            )
+            loaded = [_detached(h) for h in rows]
+            with self._lock:
+                self._roll_date(for_date)
+                for item in loaded:
+                    self._items[(item.sign, lang, for_date)] = (now, item)
+                    self._remember_latest(item, now)
+            for item in loaded:
+                found[item.sign] = item
+
+        if fallback and self.stale_max_days > 0:
+            absent = [s for s in signs if s not in found]
+            if absent:
+                found.update(self._stale_many(db, absent, lang, for_date, now))
+
+        return [found[s] for s in signs if s in found]
+
+    def _stale_many(
+        self, db: Session, signs: list[str], lang: str, for_date: date, now: float
+    ) -> dict[str, CachedHoroscope]:
+        """Последние тексты до for_date: из _latest, промахи — одним запросом с max(date) по знаку."""
+        oldest = for_date - timedelta(days=self.stale_max_days)
+        found: dict[str, CachedHoroscope] = {}
+        missing: list[str] = []
+        with self._lock:
+            for sign in signs:
+                entry = self._latest.get((sign, lang))
+                if (
+                    entry is not None
+                    and now - entry[0] < self.ttl_seconds
+                    and oldest <= entry[1].date < for_date
+                ):
+                    found[sign] = entry[1]
+                else:
+                    missing.append(sign)
+
+        if missing:
+            latest = (
+                select(Horoscope.sign, func.max(Horoscope.date).label("date"))
+                .where(
+                    Horoscope.lang == lang,
+                    Horoscope.sign.in_(missing),
+                    Horoscope.date >= oldest,
+                    Horoscope.date < for_date,
+                )
+                .group_by(Horoscope.sign)
+                .subquery()
+            )
+            rows = (
+                db.query(Horoscope)
+                .join(latest, (Horoscope.sign == latest.c.sign) & (Horoscope.date == latest.c.date))
+                .filter(Horoscope.lang == lang)
+                .all()
+            )
+            loaded = [_detached(h) for h in rows]
+            with self._lock:
+                for item in loaded:
+                    self._remember_latest(item, now)
+            for item in loaded:
+                found[item.sign] = item
+        return found
+
+    def invalidate(self, sign: str, lang: str, for_date: date):
+        """Сбросить одну запись (вызывается после записи гороскопа)."""
+        with self._lock:
+            self._items.pop((sign, lang, for_date), None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._latest.clear()
+            self._date = None
+
+    def _remember_latest(self, item: CachedHoroscope, now: float):
+        # Вызывается под self._lock; более старый текст не вытесняет свежий
+        entry = self._latest.get((item.sign, item.lang))
+        if entry is None or entry[1].date <= item.date:
+            self._latest[(item.sign, item.lang)] = (now, item)
+
+    def _roll_date(self, for_date: date):
+        # Вызывается под self._lock
+        if self._date != for_date:
+            self._items.clear()
+            self._date = for_date
+
+
+# Общий экземпляр на процесс
+horoscope_cache = HoroscopeCache()
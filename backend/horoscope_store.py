@@ -0,0 +1,104 @@
+# backend/horoscope_store.py
+#
+# Запись гороскопов в БД: крон генерации и фоновая догенерация (regeneration.py).
+
+from datetime import date
+
+from .database import upsert_insert
+from .generation import GenerationKey
+from .horoscope_cache import horoscope_cache
+from .models import Horoscope
+from .zodiac import ENGLISH_SIGN_NAMES, RUSSIAN_SIGN_NAMES
+
+
+def make_horoscope_id(sign: str, lang: str, for_date: date) -> str:
+    """Детерминированный ID: например, 'aries_ru_2026-02-06'."""
+    return f"{sign}_{lang}_{for_date.isoformat()}"
+
+
+def make_title(sign: str, lang: str, for_date: date) -> str:
+    if lang == "en":
+        return f"{ENGLISH_SIGN_NAMES.get(sign, sign)}: horoscope for {for_date.strftime('%d.%m.%Y')}"
+    sign_ru = RUSSIAN_SIGN_NAMES.get(sign, sign)
+    return f"{sign_ru}: гороскоп на {for_date.strftime('%d.%m.%Y')}"
+
+
+def upsert_horoscope(db, sign: str, lang: str, for_date: date, text: str, commit: bool = True):
+    """Создать или обновить гороскоп для знака/даты/языка."""
+    obj = (
+        db.query(Horoscope)
+        .filter(
+            Horoscope.sign == sign,
+            Horoscope.date == for_date,
+            Horoscope.lang == lang,
+        )
+        .first()
+    )
+
+    title = make_title(sign, lang, for_date)
+    h_id = make_horoscope_id(sign, lang, for_date)
+
+    if obj:
+        obj.title = title
+        obj.text = text
+    else:
+        obj = Horoscope(
+            id=h_id,
+            sign=sign,
+            date=for_date,
+            lang=lang,
+            title=title,
+            text=text,
+        )
+        db.add(obj)
+
+    if commit:
+        db.commit()
+        horoscope_cache.invalidate(sign, lang, for_date)
+
+
+def bulk_upsert_horoscopes(db, texts: dict[GenerationKey, str]):
+    """
+    Вставить/обновить пачку гороскопов одним INSERT ... ON CONFLICT (id) DO UPDATE.
+    Ключ — детерминированный id из make_horoscope_id, поэтому параллельные запуски
+    не создают дублей. Для диалектов без ON CONFLICT — построчный upsert_horoscope.
+    Коммит остаётся за вызывающим.
+    """
+    if not texts:
+        return
+
+    insert = upsert_insert(db)
+    if insert is None:
+        for (sign, lang, for_date), text in texts.items():
+            upsert_horoscope(db, sign=sign, lang=lang, for_date=for_date, text=text, commit=False)
+        return
+
+    rows = [
+        {
+            "id": make_horoscope_id(sign, lang, for_date),
+            "sign": sign,
+            "date": for_date,
+            "lang": lang,
+            "title": make_title(sign, lang, for_date),
+            "text": text,
+        }
+        for (sign, lang, for_date), text in texts.items()
+    ]
+    stmt = insert(Horoscope).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Horoscope.id],
+        set_={"title": stmt.excluded.title, "text": stmt.excluded.text},
+    )
+    db.execute(stmt)
+
+
+def save_horoscopes(db, texts: dict[GenerationKey, str]):
+    """Записать пачку сгенерированных текстов одной транзакцией."""
+    try:
+        bulk_upsert_horoscopes(db, texts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for sign, lang, for_date in texts:
+        horoscope_cache.invalidate(sign, lang, for_date)
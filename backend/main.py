@@ -1,25 +1,29 @@
+import hashlib
+import json
 import uuid
-from datetime import date, datetime, time
-from typing import List, Optional
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterator, List, Literal, Optional
 from uuid import UUID
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal
-from .models import User, UserDevice, UserSign, Horoscope
+from .config import DB_ASYNC, HOROSCOPE_BATCH_MAX_KEYS, SNAPSHOT_GZIP
+from .database import SessionLocal, get_async_sessionmaker, upsert_insert
+from .metrics import REGISTRY, MetricsMiddleware
+from .models import Horoscope, User, UserDevice
+from .regeneration import regenerator
+from .sign_storage import insert_user, read_many_user_signs, read_user_signs, replace_user_signs
+from .snapshot import SnapshotPart, snapshot_store
+from .user_sign_cache import user_sign_cache
 
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+MOSCOW_TZ = timezone(timedelta(hours=3))
 
 
 def get_db():
@@ -30,6 +34,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
 # ---------- Pydantic-схемы ----------
 
 class RegisterDeviceRequest(BaseModel):
@@ -48,6 +57,35 @@ class HoroscopeItem(BaseModel):
     sign: str
     title: Optional[str] = None
     text: str
+    # Текста на сегодня ещё нет — отдан последний более ранний (поле есть только при true)
+    stale: bool = False
+
+
+class HoroscopeKey(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    sign: str
+    lang: str = "ru"
+    for_date: date = Field(alias="date")
+
+
+class HoroscopeBatchRequest(BaseModel):
+    user_ids: List[UUID] = Field(default_factory=list)
+    lang: str = "ru"
+    # Даты для user_ids; пусто — сегодня по Москве
+    dates: List[date] = Field(default_factory=list)
+    keys: List[HoroscopeKey] = Field(default_factory=list)
+
+
+class HoroscopeBatchItem(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    user_id: Optional[UUID] = None
+    sign: str
+    lang: str
+    for_date: date = Field(alias="date")
+    title: Optional[str] = None
+    text: str
 
 
 class UserSettings(BaseModel):
@@ -66,6 +104,142 @@ class UserSettingsUpdate(BaseModel):
 
 # ---------- Вспомогательные функции ----------
 
+def get_moscow_now() -> datetime:
+    return datetime.now(timezone.utc).astimezone(MOSCOW_TZ)
+
+
+def horoscope_etag(parts: List[SnapshotPart], lang: str, today: date, gzipped: bool = False) -> str:
+    """
+    ETag ответа /horoscope/today: дата, язык, знаки и контрольные суммы готовых JSON
+    (текст на ту же дату может быть перегенерирован). Сжатое тело — другое представление,
+    поэтому у него свой сильный ETag с суффиксом -gzip.
+    """
+    tokens = [today.isoformat(), lang] + [f"{p.sign}:{p.crc:08x}" for p in parts]
+    digest = hashlib.sha1("|".join(tokens).encode()).hexdigest()[:20]
+    return f'"{digest}-gzip"' if gzipped else f'"{digest}"'
+
+
+def accepts_gzip(request: Request) -> bool:
+    """Accept-Encoding с q-значениями: gzip (или *) с q > 0 и без явного gzip;q=0."""
+    qualities = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    for coding in ("gzip", "x-gzip"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return qualities.get("*", 0) > 0
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def today_response(request: Request, parts: List[SnapshotPart], lang: str, now_ms: datetime) -> Response:
+    """
+    Ответ /horoscope/today из предсериализованных частей: ETag/Cache-Control,
+    304 при совпадении If-None-Match, gzip, если клиент его принимает (q > 0).
+    """
+    if not parts:
+        # Гороскопы ещё не сгенерированы — клиент не должен кэшировать пустой ответ
+        return Response(b"[]", media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+    gzipped = SNAPSHOT_GZIP and accepts_gzip(request)
+    headers = {
+        "ETag": horoscope_etag(parts, lang, now_ms.date(), gzipped),
+        # Ответ приватный (зависит от user_id) и меняется вместе с набором знаков или
+        # устаревшими (stale) текстами — клиент перепроверяет каждый раз, экономия — на 304
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        body = snapshot_store.render_gzip(parts)
+    else:
+        body = snapshot_store.render(parts)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def unique_signs(signs: List[str]) -> List[str]:
+    """Знаки без повторов, в порядке запроса."""
+    return list(dict.fromkeys(signs))
+
+
+def save_user_signs(db: Session, user_id: UUID, signs: List[str]):
+    """Записывает знаки пользователя в хранилище из SIGN_STORAGE_MODE (без коммита)."""
+    try:
+        replace_user_signs(db, user_id, signs)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Unknown zodiac sign")
+
+
+def create_user(db: Session, signs: List[str]) -> UUID:
+    """Новый пользователь сразу со знаками (без коммита)."""
+    try:
+        return insert_user(db, signs)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Unknown zodiac sign")
+
+
+def upsert_device(db: Session, user_id: UUID, fcm_token: str, lang: str, push_time: time):
+    """
+    Один INSERT ... ON CONFLICT (user_id, fcm_token) DO UPDATE: новое устройство
+    или обновление языка и времени пуша у существующего (is_active не трогаем).
+    Клиент прислал токен — значит, он рабочий: отметка token_invalid_at снимается.
+    """
+    insert = upsert_insert(db)
+    values = {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "fcm_token": fcm_token,
+        "lang": lang,
+        "push_time": push_time,
+        "is_active": True,
+    }
+    if insert is None:
+        device = (
+            db.query(UserDevice)
+            .filter(UserDevice.user_id == user_id, UserDevice.fcm_token == fcm_token)
+            .first()
+        )
+        if device is None:
+            db.add(UserDevice(**values))
+        else:
+            device.lang = lang
+            device.push_time = push_time
+            device.token_invalid_at = None
+        return
+
+    stmt = insert(UserDevice).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDevice.user_id, UserDevice.fcm_token],
+        set_={
+            "lang": stmt.excluded.lang,
+            "push_time": stmt.excluded.push_time,
+            "token_invalid_at": None,
+        },
+    )
+    db.execute(stmt)
+
+
 def parse_push_time(push_time_str: str) -> time:
     try:
         return datetime.strptime(push_time_str, "%H:%M").time()
@@ -76,120 +250,194 @@ def parse_push_time(push_time_str: str) -> time:
         )
 
 
-# ---------- Эндпоинты регистрации / гороскопа ----------
+# ---------- Логика эндпоинтов ----------
+# Работает с синхронной Session; async-обработчики вызывают её через AsyncSession.run_sync,
+# так что запросы идут через async-драйвер, а код остаётся один.
 
-@app.post("/register_device", response_model=RegisterDeviceResponse)
-def register_device(payload: RegisterDeviceRequest, db: Session = Depends(get_db)):
+# Регистрация / гороскоп
+
+def register_device_in_db(
+    db: Session, payload: RegisterDeviceRequest, update_cache: bool = True
+) -> RegisterDeviceResponse:
     """
     Регистрирует пользователя и устройство, принимает FCM токен, язык, push_time и знаки.
-    - Если user_id не передан или не найден, создаётся новый User.
-    - Обновляется/создаётся UserDevice с указанным fcm_token.
-    - Обновляются UserSign под пользователя.
+    - Если user_id не передан или не найден, создаётся новый User (сразу со знаками).
+    - Устройство с указанным fcm_token — upsert по (user_id, fcm_token).
+    - Знаки существующего пользователя заменяются по разнице (см. sign_storage).
+    Ответ строится из запроса, без перечитывания из БД.
+    update_cache=False — кэш знаков обновляет вызывающий (async-обработчики).
     """
-    user: Optional[User] = None
-
-    if payload.user_id is not None:
-        user = db.query(User).filter(User.id == payload.user_id).first()
-
-    if user is None:
-        user = User()
-        db.add(user)
-        db.flush()  # появляется user.id (UUID)
-
     push_time_value = parse_push_time(payload.push_time)
+    signs = unique_signs(payload.signs)
 
-    device = (
-        db.query(UserDevice)
-        .filter(
-            UserDevice.user_id == user.id,
-            UserDevice.fcm_token == payload.fcm_token,
-        )
-        .first()
-    )
+    user_id = payload.user_id
+    if user_id is not None and db.execute(select(User.id).where(User.id == user_id)).first() is None:
+        user_id = None
 
-    if device is None:
-        device = UserDevice(
-            user_id=user.id,
-            fcm_token=payload.fcm_token,
-            lang=payload.lang,
-            push_time=push_time_value,
-            last_push_date=None,
-            # is_active по умолчанию true (server_default в модели)
-        )
-        db.add(device)
+    if user_id is None:
+        user_id = create_user(db, signs)
     else:
-        device.lang = payload.lang
-        device.push_time = push_time_value
-
-    db.query(UserSign).filter(UserSign.user_id == user.id).delete()
-    for sign in payload.signs:
-        db.add(UserSign(user_id=user.id, sign=sign))
+        save_user_signs(db, user_id, signs)
 
+    upsert_device(db, user_id, payload.fcm_token, payload.lang, push_time_value)
     db.commit()
-    db.refresh(user)
+    if update_cache:
+        user_sign_cache.set(user_id, signs)
 
-    return RegisterDeviceResponse(user_id=user.id)
+    return RegisterDeviceResponse(user_id=user_id)
 
 
-@app.get("/horoscope/today", response_model=List[HoroscopeItem])
-def get_today(
+def today_snapshot_parts(
+    db: Session,
     user_id: UUID,
-    lang: str = "ru",
-    db: Session = Depends(get_db),
-):
+    lang: str,
+    today: date,
+    sign_list: Optional[List[str]] = None,
+) -> List[SnapshotPart]:
     """
-    Возвращает список гороскопов на сегодня по выбранным знакам пользователя.
-    user_id — UUID (как в users.id).
+    Гороскопы на сегодня по выбранным знакам пользователя — готовыми JSON-частями.
+    user_id — UUID (как в users.id), today — московская дата.
     Формат ответа: список объектов [{sign, title, text}, ...].
+    Если текста на сегодня нет, отдаётся последний более ранний с "stale": true,
+    а недостающий гороскоп догенерируется в фоне (single-flight, см. regeneration).
+    sign_list — уже известные знаки (async-обработчики), иначе из кэша знаков.
     """
-    signs = db.query(UserSign).filter(UserSign.user_id == user_id).all()
-    if not signs:
+    if sign_list is None:
+        sign_list = user_sign_cache.load(db, user_id)
+    if not sign_list:
         return []
 
-    today = date.today()
-    sign_list = [s.sign for s in signs]
+    # Тексты на сегодня меняются раз в день — берём из кэша процесса уже сериализованными
+    parts = snapshot_store.parts(db, sign_list, lang, today, fallback=True)
+    fresh = {p.sign for p in parts if not p.stale}
+    if len(fresh) < len(sign_list):
+        regenerator.request((sign, lang, today) for sign in sign_list if sign not in fresh)
+    return parts
 
-    horoscopes = (
-        db.query(Horoscope)
-        .filter(
-            Horoscope.date == today,
-            Horoscope.lang == lang,
-            Horoscope.sign.in_(sign_list),
+
+# Пакетная выдача гороскопов
+
+BatchKey = tuple[str, str, date]  # (sign, lang, date)
+BatchRow = tuple[Optional[UUID], BatchKey]  # (user_id или None для явных ключей, ключ)
+
+
+def batch_scope(payload: HoroscopeBatchRequest, today: date) -> tuple[List[date], List[UUID]]:
+    """Даты и пользователи запроса без повторов; слишком большой запрос — 400."""
+    dates = list(dict.fromkeys(payload.dates)) or [today]
+    user_ids = list(dict.fromkeys(payload.user_ids))
+    if len(user_ids) * len(dates) + len(payload.keys) > HOROSCOPE_BATCH_MAX_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many keys in batch (max {HOROSCOPE_BATCH_MAX_KEYS})",
         )
-        .all()
-    )
+    return dates, user_ids
+
 
-    return [
-        HoroscopeItem(
-            sign=h.sign,
-            title=h.title,
-            text=h.text,
+def resolve_horoscope_batch(
+    db: Session,
+    payload: HoroscopeBatchRequest,
+    today: date,
+    user_signs: Optional[dict[UUID, List[str]]] = None,
+) -> tuple[List[BatchRow], dict[BatchKey, tuple[Optional[str], str]]]:
+    """
+    Разворачивает запрос в строки ответа и достаёт тексты одним запросом к horoscopes.
+    - user_ids → знаки через кэш знаков (промахи — одним запросом) × dates × lang.
+    - keys — как есть, user_id = None.
+    Выборка идёт по date IN / lang IN / sign IN (индекс ix_horoscopes_date_lang_sign):
+    лишних строк не больше 12 на пару (date, lang). Ключи без гороскопа в ответ не попадают.
+    user_signs — уже известные знаки пользователей (async-обработчики), иначе из кэша знаков.
+    """
+    dates, user_ids = batch_scope(payload, today)
+
+    rows: List[BatchRow] = []
+    if user_signs is None:
+        user_signs = user_sign_cache.load_many(db, user_ids)
+    for user_id in user_ids:
+        for for_date in dates:
+            for sign in user_signs[user_id]:
+                rows.append((user_id, (sign, payload.lang, for_date)))
+    for key in payload.keys:
+        rows.append((None, (key.sign, key.lang, key.for_date)))
+    if not rows:
+        return [], {}
+
+    wanted = {key for _, key in rows}
+    found = db.execute(
+        select(Horoscope.sign, Horoscope.lang, Horoscope.date, Horoscope.title, Horoscope.text).where(
+            Horoscope.date.in_({d for _, _, d in wanted}),
+            Horoscope.lang.in_({l for _, l, _ in wanted}),
+            Horoscope.sign.in_({s for s, _, _ in wanted}),
         )
-        for h in horoscopes
-    ]
+    )
+    texts = {(r.sign, r.lang, r.date): (r.title, r.text) for r in found}
+    return [row for row in rows if row[1] in texts], texts
+
+
+def encode_batch_items(
+    rows: List[BatchRow], texts: dict[BatchKey, tuple[Optional[str], str]]
+) -> Iterator[bytes]:
+    """JSON-строки элементов ответа по одной (формат — как у HoroscopeBatchItem)."""
+    for user_id, (sign, lang, for_date) in rows:
+        title, text = texts[(sign, lang, for_date)]
+        yield json.dumps(
+            {
+                "user_id": str(user_id) if user_id else None,
+                "sign": sign,
+                "lang": lang,
+                "date": for_date.isoformat(),
+                "title": title,
+                "text": text,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+
+
+def wants_ndjson(request: Request, output: Optional[str]) -> bool:
+    if output is not None:
+        return output == "ndjson"
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def batch_response(
+    request: Request,
+    output: Optional[str],
+    rows: List[BatchRow],
+    texts: dict[BatchKey, tuple[Optional[str], str]],
+) -> Response:
+    """
+    Ответ /horoscope/batch: JSON-массив или NDJSON (?format=ndjson либо
+    Accept: application/x-ndjson). NDJSON отдаётся потоком — элементы кодируются
+    по мере отправки, без сборки всего тела в памяти.
+    """
+    items = encode_batch_items(rows, texts)
+    if wants_ndjson(request, output):
+        return StreamingResponse(
+            (item + b"\n" for item in items), media_type="application/x-ndjson"
+        )
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
 
 
-# ---------- Эндпоинты настроек пользователя ----------
+# Настройки пользователя
 
-@app.get("/user/settings", response_model=UserSettings)
-def get_user_settings(
-    user_id: UUID,
-    db: Session = Depends(get_db),
-):
+def read_user_settings(
+    db: Session, user_id: UUID, signs: Optional[List[str]] = None
+) -> UserSettings:
     """
     Возвращает текущие настройки пользователя:
     - список знаков,
     - время пушей (по Москве),
     - флаг активности устройства.
     Берём первое (по дате создания) устройство пользователя.
+    signs — уже известные знаки (async-обработчики), иначе из кэша знаков.
     """
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Знаки
-    signs_rows = db.query(UserSign).filter(UserSign.user_id == user_id).all()
-    signs = [r.sign for r in signs_rows]
+    if signs is None:
+        signs = user_sign_cache.load(db, user_id)
 
     # Устройство (берём самое раннее)
     device = (
@@ -220,65 +468,242 @@ def get_user_settings(
     )
 
 
-@app.put("/user/settings", response_model=UserSettings)
-def update_user_settings(
-    payload: UserSettingsUpdate,
-    db: Session = Depends(get_db),
-):
+def write_user_settings(
+    db: Session, payload: UserSettingsUpdate, update_cache: bool = True
+) -> UserSettings:
     """
     Обновляет:
     - список знаков пользователя,
     - время пушей для его устройства,
     - флаг активности (вкл/выкл пуши).
-    Работает с первым устройством пользователя.
+    Работает с первым устройством пользователя: один UPDATE ... RETURNING по нему,
+    проверка пользователя — только если устройства нет. Ответ строится из запроса.
+    update_cache=False — кэш знаков обновляет вызывающий (async-обработчики).
     """
-    user = db.query(User).filter(User.id == payload.user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-
     push_time_value = parse_push_time(payload.push_time)
+    signs = unique_signs(payload.signs)
 
-    device = (
-        db.query(UserDevice)
-        .filter(UserDevice.user_id == user.id)
+    first_device = (
+        select(UserDevice.id)
+        .where(UserDevice.user_id == payload.user_id)
         .order_by(UserDevice.created_at.asc())
-        .first()
+        .limit(1)
+        .scalar_subquery()
     )
-
-    if device is None:
+    updated = db.execute(
+        update(UserDevice)
+        .where(UserDevice.id == first_device)
+        .values(push_time=push_time_value, is_active=payload.is_active)
+        .returning(UserDevice.id)
+    ).first()
+
+    if updated is None:
+        if db.execute(select(User.id).where(User.id == payload.user_id)).first() is None:
+            raise HTTPException(status_code=404, detail="User not found")
         # Если устройства нет, создаём "пустое" — fcm_token позже обновит register_device
-        device = UserDevice(
-            user_id=user.id,
-            fcm_token="",
-            lang="ru",
-            push_time=push_time_value,
-            last_push_date=None,
-            is_active=payload.is_active,
+        db.add(
+            UserDevice(
+                user_id=payload.user_id,
+                fcm_token="",
+                lang="ru",
+                push_time=push_time_value,
+                last_push_date=None,
+                is_active=payload.is_active,
+            )
         )
-        db.add(device)
-    else:
-        device.push_time = push_time_value
-        device.is_active = payload.is_active
 
     # Обновляем знаки
-    db.query(UserSign).filter(UserSign.user_id == user.id).delete()
-    for sign in payload.signs:
-        db.add(UserSign(user_id=user.id, sign=sign))
+    save_user_signs(db, payload.user_id, signs)
 
     db.commit()
-
-    push_time_str = device.push_time.strftime("%H:%M")
-    signs_rows = db.query(UserSign).filter(UserSign.user_id == user.id).all()
-    signs = [r.sign for r in signs_rows]
+    if update_cache:
+        user_sign_cache.set(payload.user_id, signs)
 
     return UserSettings(
-        user_id=user.id,
+        user_id=payload.user_id,
         signs=signs,
-        push_time=push_time_str,
-        is_active=device.is_active,
+        push_time=push_time_value.strftime("%H:%M"),
+        is_active=payload.is_active,
     )
 
 
-@app.get("/ping")
+# ---------- Эндпоинты (синхронная сессия, threadpool Starlette) ----------
+
+router = APIRouter()
+
+
+@router.post("/register_device", response_model=RegisterDeviceResponse)
+def register_device(payload: RegisterDeviceRequest, db: Session = Depends(get_db)):
+    """Регистрация пользователя и устройства (см. register_device_in_db)."""
+    return register_device_in_db(db, payload)
+
+
+@router.get("/horoscope/today", response_model=List[HoroscopeItem])
+def get_today(
+    request: Request,
+    user_id: UUID,
+    lang: str = "ru",
+    db: Session = Depends(get_db),
+):
+    """Гороскопы на сегодня по знакам пользователя (см. today_snapshot_parts)."""
+    now_ms = get_moscow_now()
+    parts = today_snapshot_parts(db, user_id, lang, now_ms.date())
+    return today_response(request, parts, lang, now_ms)
+
+
+@router.post("/horoscope/batch", response_model=List[HoroscopeBatchItem])
+def get_horoscope_batch(
+    request: Request,
+    payload: HoroscopeBatchRequest,
+    output: Optional[Literal["json", "ndjson"]] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+):
+    """Гороскопы по спискам пользователей и ключей (см. resolve_horoscope_batch)."""
+    rows, texts = resolve_horoscope_batch(db, payload, get_moscow_now().date())
+    return batch_response(request, output, rows, texts)
+
+
+@router.get("/user/settings", response_model=UserSettings)
+def get_user_settings(
+    user_id: UUID,
+    db: Session = Depends(get_db),
+):
+    """Текущие настройки пользователя (см. read_user_settings)."""
+    return read_user_settings(db, user_id)
+
+
+@router.put("/user/settings", response_model=UserSettings)
+def update_user_settings(
+    payload: UserSettingsUpdate,
+    db: Session = Depends(get_db),
+):
+    """Обновление настроек пользователя (см. write_user_settings)."""
+    return write_user_settings(db, payload)
+
+
+# ---------- Те же эндпоинты на async-движке (DB_ASYNC=1) ----------
+
+async_router = APIRouter()
+
+
+# С общим бэкендом (Redis) get/set кэша знаков — блокирующие сетевые вызовы, поэтому
+# async-обработчики делают их в threadpool, а не внутри run_sync на цикле событий.
+
+async def sign_cache_call(fn, *args):
+    if user_sign_cache.shared is None:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+async def load_user_signs_async(db: AsyncSession, user_id: UUID) -> List[str]:
+    """user_sign_cache.load для async-обработчиков."""
+    signs = await sign_cache_call(user_sign_cache.get, user_id)
+    if signs is None:
+        signs = await db.run_sync(read_user_signs, user_id)
+        await sign_cache_call(user_sign_cache.set, user_id, signs)
+    return signs
+
+
+async def load_many_user_signs_async(db: AsyncSession, user_ids: List[UUID]) -> dict[UUID, List[str]]:
+    """user_sign_cache.load_many для async-обработчиков."""
+    result = await sign_cache_call(user_sign_cache.get_many, user_ids)
+    misses = [user_id for user_id in user_ids if user_id not in result]
+    if misses:
+        loaded = await db.run_sync(read_many_user_signs, misses)
+        loaded = {user_id: loaded.get(user_id, []) for user_id in misses}
+        await sign_cache_call(user_sign_cache.set_many, loaded)
+        result.update(loaded)
+    return result
+
+
+@async_router.post("/register_device", response_model=RegisterDeviceResponse)
+async def register_device_async(
+    payload: RegisterDeviceRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Регистрация пользователя и устройства (см. register_device_in_db)."""
+    response = await db.run_sync(register_device_in_db, payload, False)
+    await sign_cache_call(user_sign_cache.set, response.user_id, unique_signs(payload.signs))
+    return response
+
+
+@async_router.get("/horoscope/today", response_model=List[HoroscopeItem])
+async def get_today_async(
+    request: Request,
+    user_id: UUID,
+    lang: str = "ru",
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Гороскопы на сегодня по знакам пользователя (см. today_snapshot_parts)."""
+    now_ms = get_moscow_now()
+    sign_list = await load_user_signs_async(db, user_id)
+    parts = await db.run_sync(today_snapshot_parts, user_id, lang, now_ms.date(), sign_list)
+    return today_response(request, parts, lang, now_ms)
+
+
+@async_router.post("/horoscope/batch", response_model=List[HoroscopeBatchItem])
+async def get_horoscope_batch_async(
+    request: Request,
+    payload: HoroscopeBatchRequest,
+    output: Optional[Literal["json", "ndjson"]] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Гороскопы по спискам пользователей и ключей (см. resolve_horoscope_batch)."""
+    today = get_moscow_now().date()
+    _, user_ids = batch_scope(payload, today)
+    user_signs = await load_many_user_signs_async(db, user_ids)
+    rows, texts = await db.run_sync(resolve_horoscope_batch, payload, today, user_signs)
+    return batch_response(request, output, rows, texts)
+
+
+@async_router.get("/user/settings", response_model=UserSettings)
+async def get_user_settings_async(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Текущие настройки пользователя (см. read_user_settings)."""
+    signs = await load_user_signs_async(db, user_id)
+    return await db.run_sync(read_user_settings, user_id, signs)
+
+
+@async_router.put("/user/settings", response_model=UserSettings)
+async def update_user_settings_async(
+    payload: UserSettingsUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Обновление настроек пользователя (см. write_user_settings)."""
+    response = await db.run_sync(write_user_settings, payload, False)
+    await sign_cache_call(user_sign_cache.set, payload.user_id, response.signs)
+    return response
+
+
 def ping():
     return {"status": "ok"}
+
+
+def metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def create_app(db_async: bool = DB_ASYNC) -> FastAPI:
+    """Приложение с синхронными или async-обработчиками БД."""
+    app = FastAPI()
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Снаружи CORS: в латентность входит вся обработка запроса
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(async_router if db_async else router)
+    app.add_api_route("/ping", ping, methods=["GET"])
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    return app
+
+
+app = create_app()
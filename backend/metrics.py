@@ -0,0 +1,353 @@
+# backend/metrics.py
+#
+# Метрики в текстовом формате Prometheus без внешних зависимостей:
+# счётчики и гистограммы с метками, таймеры этапов кронов, учёт SQL-запросов
+# через события SQLAlchemy. API отдаёт их на /metrics, кроны печатают сводку в лог.
+
+import contextvars
+import logging
+import threading
+import time as time_mod
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def items(self) -> list[tuple[tuple, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+@dataclass
+class _HistogramSeries:
+    counts: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(counts=[0] * len(self.buckets))
+            if index < len(self.buckets):
+                series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time_mod.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time_mod.perf_counter() - started, **labels)
+
+    def items(self) -> list[tuple[tuple, _HistogramSeries]]:
+        with self._lock:
+            return [
+                (key, _HistogramSeries(list(s.counts), s.total, s.count))
+                for key, s in sorted(self._series.items())
+            ]
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, series in self.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {cumulative}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series.total:g}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[str]:
+        """Короткая сводка для лога крона: только серии с данными."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for key, s in metric.items():
+                    avg_ms = s.total / s.count * 1000 if s.count else 0.0
+                    lines.append(
+                        f"{metric.name}{_format_labels(key)}: count={s.count} "
+                        f"total={s.total:.3f}s avg={avg_ms:.1f}ms"
+                    )
+            elif isinstance(metric, Counter):
+                for key, value in metric.items():
+                    lines.append(f"{metric.name}{_format_labels(key)}: {value:g}")
+        return lines
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Latency of API requests by route template",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries",
+    "SQL statements executed per API request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+HTTP_REQUEST_DB_SECONDS = REGISTRY.histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL per API request",
+    ("route",),
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "Latency of single SQL statements",
+    ("statement",),
+)
+JOB_STAGE_DURATION = REGISTRY.histogram(
+    "job_stage_duration_seconds",
+    "Time spent in cron job stages",
+    ("job", "stage"),
+)
+EXTERNAL_CALL_DURATION = REGISTRY.histogram(
+    "external_call_duration_seconds",
+    "Latency of calls to external services (FCM, DeepSeek)",
+    ("service", "operation"),
+)
+EXTERNAL_CALL_ERRORS = REGISTRY.counter(
+    "external_call_errors_total",
+    "Failed calls to external services by error type",
+    ("service", "operation", "error"),
+)
+FCM_MESSAGES = REGISTRY.counter(
+    "fcm_messages_total",
+    "Push messages by delivery outcome",
+    ("outcome",),
+)
+
+
+def stage_timer(job: str, stage: str):
+    """with stage_timer("push", "send"): ... — время этапа крона."""
+    return JOB_STAGE_DURATION.time(job=job, stage=stage)
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Время вызова внешнего сервиса и счётчик ошибок по типу исключения."""
+    started = time_mod.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        EXTERNAL_CALL_ERRORS.inc(service=service, operation=operation, error=type(e).__name__)
+        raise
+    finally:
+        EXTERNAL_CALL_DURATION.observe(
+            time_mod.perf_counter() - started, service=service, operation=operation
+        )
+
+
+# ---------- SQL ----------
+
+@dataclass
+class RequestDbStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+# Счётчик запросов текущего HTTP-запроса. Starlette копирует контекст в threadpool,
+# а run_sync async-сессии выполняется в той же задаче, так что хуки видят один объект.
+_request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+
+def begin_request_db_stats() -> tuple[RequestDbStats, contextvars.Token]:
+    stats = RequestDbStats()
+    return stats, _request_db_stats.set(stats)
+
+
+def end_request_db_stats(token: contextvars.Token):
+    _request_db_stats.reset(token)
+
+
+def _statement_kind(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine: Engine):
+    """Вешает на движок хуки учёта SQL (для async-движка — на engine.sync_engine)."""
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time_mod.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time_mod.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.observe(elapsed, statement=_statement_kind(statement))
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Упавший запрос не дойдёт до after_cursor_execute — убираем его отметку
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+# ---------- HTTP ----------
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентность по шаблону маршрута (не по сырому пути — без
+    взрыва числа серий) и число/время SQL-запросов за запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats, token = begin_request_db_stats()
+        started = time_mod.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time_mod.perf_counter() - started
+            end_request_db_stats(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(
+                elapsed, method=scope["method"], route=path, status=str(status)
+            )
+            HTTP_REQUEST_DB_QUERIES.observe(stats.queries, route=path)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.seconds, route=path)
+
+
+def log_summary(log: logging.Logger, title: str):
+    """Сводка метрик процесса в лог — в конце запуска крона."""
+    lines = REGISTRY.summary()
+    log.info("%s metrics (%d series)", title, len(lines))
+    for line in lines:
+        log.info("  %s", line)
@@ -0,0 +1,255 @@
+# backend/migrations.py
+#
+# Версионированные миграции схемы без внешних зависимостей.
+# Применённые версии хранятся в таблице schema_migrations.
+# Запуск: python -m backend.migrations
+
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    Time,
+    TIMESTAMP,
+    Engine,
+    bindparam,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection
+
+from .database import Base, engine as default_engine
+from . import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+from .models import random_push_shard
+from .zodiac import SIGN_BITS
+
+logger = logging.getLogger(__name__)
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", TIMESTAMP(timezone=True), server_default=func.now()),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Регистрирует функцию как миграцию с номером version."""
+
+    def decorator(fn: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+
+    return decorator
+
+
+# ---------- Помощники (идемпотентные) ----------
+
+def add_column_if_missing(conn: Connection, table_name: str, column: Column):
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column.name in existing:
+        return
+    col_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {col_type}"))
+
+
+def create_table_if_missing(conn: Connection, table_name: str):
+    Base.metadata.tables[table_name].create(conn, checkfirst=True)
+
+
+def create_index_if_missing(conn: Connection, table_name: str, index_name: str):
+    """Создаёт индекс, объявленный в модели, если его ещё нет."""
+    table = Base.metadata.tables[table_name]
+    index = next(i for i in table.indexes if i.name == index_name)
+    index.create(conn, checkfirst=True)
+
+
+# ---------- Миграции ----------
+
+@migration(1, "baseline: tables from models")
+def _baseline(conn: Connection):
+    # На существующей базе create_all пропускает уже созданные таблицы
+    Base.metadata.create_all(conn)
+
+
+@migration(2, "user_devices: push claim lease")
+def _push_claim_lease(conn: Connection):
+    add_column_if_missing(conn, "user_devices", Column("push_claim_id", String(36)))
+    add_column_if_missing(
+        conn, "user_devices", Column("push_claimed_until", TIMESTAMP(timezone=True))
+    )
+
+
+@migration(3, "user_devices: index on push_time")
+def _push_time_index(conn: Connection):
+    # Заменён частичным индексом в миграции 5, поэтому описан здесь, а не в модели
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_devices_push_time ON user_devices (push_time)"))
+
+
+@migration(4, "generation_status table")
+def _generation_status(conn: Connection):
+    create_table_if_missing(conn, "generation_status")
+
+
+@migration(5, "indexes for hot query shapes")
+def _hot_path_indexes(conn: Connection):
+    create_index_if_missing(conn, "horoscopes", "ix_horoscopes_date_lang_sign")
+    # Заменён уникальным индексом в миграции 8, поэтому описан здесь, а не в модели
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_user_devices_user_token ON user_devices (user_id, fcm_token)")
+    )
+    create_index_if_missing(conn, "user_devices", "ix_user_devices_user_created")
+    # Без push_shard (колонка появится в миграции 10), поэтому описан здесь, а не в модели
+    legacy = Table(
+        "user_devices",
+        MetaData(),
+        Column("push_time", Time),
+        Column("last_push_date", Date),
+        Column("is_active", Boolean),
+    )
+    Index(
+        "ix_user_devices_active_push_time",
+        legacy.c.push_time,
+        legacy.c.last_push_date,
+        postgresql_where=legacy.c.is_active.is_(True),
+        sqlite_where=legacy.c.is_active.is_(True),
+    ).create(conn, checkfirst=True)
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_devices_push_time"))
+
+
+def backfill_signs_mask(conn: Connection, only_missing: bool = True) -> int:
+    """
+    Пересчитывает users.signs_mask из user_signs; возвращает число обновлённых строк.
+    only_missing=False — пересчитать все маски (перед переключением SIGN_STORAGE_MODE
+    с dual на mask, если приложение какое-то время работало в режиме rows).
+    """
+    # Знак у пользователя встречается один раз (PK), поэтому SUM битов = побитовое ИЛИ;
+    # так работает и в PostgreSQL, и в SQLite. Коды вне ZODIAC_SIGNS дают 0.
+    bit_case = " ".join(f"WHEN '{sign}' THEN {bit}" for sign, bit in SIGN_BITS.items())
+    sql = (
+        "UPDATE users SET signs_mask = ("
+        f"SELECT COALESCE(SUM(CASE user_signs.sign {bit_case} ELSE 0 END), 0) "
+        "FROM user_signs WHERE user_signs.user_id = users.id"
+        ")"
+    )
+    if only_missing:
+        sql += " WHERE signs_mask IS NULL"
+    return conn.execute(text(sql)).rowcount
+
+
+@migration(6, "users.signs_mask + backfill from user_signs")
+def _signs_mask(conn: Connection):
+    add_column_if_missing(conn, "users", Column("signs_mask", SmallInteger))
+    backfill_signs_mask(conn)
+
+
+@migration(7, "user_devices: push retry backoff")
+def _push_retry_backoff(conn: Connection):
+    add_column_if_missing(conn, "user_devices", Column("push_failures", Integer))
+    add_column_if_missing(conn, "user_devices", Column("push_retry_at", TIMESTAMP(timezone=True)))
+
+
+@migration(8, "user_devices: unique (user_id, fcm_token)")
+def _unique_user_token(conn: Connection):
+    # Дубли устройства с тем же токеном у пользователя: оставляем самое раннее
+    # (его же берёт /user/settings), остальные удаляем
+    conn.execute(
+        text(
+            "DELETE FROM user_devices WHERE id IN ("
+            "SELECT d.id FROM user_devices d JOIN user_devices k "
+            "ON k.user_id = d.user_id AND k.fcm_token = d.fcm_token AND k.id <> d.id "
+            "WHERE k.created_at < d.created_at "
+            "OR (k.created_at = d.created_at AND k.id < d.id) "
+            "OR (k.created_at IS NOT NULL AND d.created_at IS NULL) "
+            "OR (k.created_at IS NULL AND d.created_at IS NULL AND k.id < d.id))"
+        )
+    )
+    create_index_if_missing(conn, "user_devices", "uq_user_devices_user_token")
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_devices_user_token"))
+
+
+@migration(9, "deepseek_responses table")
+def _deepseek_responses(conn: Connection):
+    create_table_if_missing(conn, "deepseek_responses")
+
+
+@migration(10, "user_devices: push_shard for SQL-side push sharding")
+def _push_shard(conn: Connection):
+    add_column_if_missing(conn, "user_devices", Column("push_shard", SmallInteger))
+    devices = Base.metadata.tables["user_devices"]
+    ids = conn.execute(select(devices.c.id).where(devices.c.push_shard.is_(None))).scalars().all()
+    stmt = (
+        update(devices)
+        .where(devices.c.id == bindparam("device_id"))
+        .values(push_shard=bindparam("shard"))
+    )
+    for start in range(0, len(ids), 10_000):
+        batch = ids[start:start + 10_000]
+        conn.execute(stmt, [{"device_id": i, "shard": random_push_shard()} for i in batch])
+    # Индекс рассылки пересоздаётся с push_shard
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_devices_active_push_time"))
+    create_index_if_missing(conn, "user_devices", "ix_user_devices_active_push_time")
+
+
+@migration(11, "user_devices: token_invalid_at")
+def _token_invalid_at(conn: Connection):
+    add_column_if_missing(conn, "user_devices", Column("token_invalid_at", TIMESTAMP(timezone=True)))
+
+
+# ---------- Применение ----------
+
+def upgrade(engine: Engine = default_engine) -> list[int]:
+    """Применяет все ещё не применённые миграции, каждую в своей транзакции."""
+    _meta.create_all(engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    done = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in applied:
+            continue
+        logger.info("Applying migration %d: %s", m.version, m.description)
+        with engine.begin() as conn:
+            m.upgrade(conn)
+            conn.execute(
+                schema_migrations.insert().values(version=m.version, description=m.description)
+            )
+        done.append(m.version)
+    return done
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    applied = upgrade()
+    logger.info("Applied migrations: %s", applied or "none")
+
+    if "--backfill-signs-mask" in sys.argv[1:]:
+        with default_engine.begin() as conn:
+            updated = backfill_signs_mask(conn, only_missing=False)
+        logger.info("Recomputed signs_mask for %d users", updated)
@@ -1,3 +1,4 @@
+import random
 import uuid
 
 from sqlalchemy import (
@@ -9,6 +10,9 @@ from sqlalchemy import (
     ForeignKey,
     TIMESTAMP,
     Boolean,
+    Index,
+    Integer,
+    SmallInteger,
     func,
 )
 from sqlalchemy.dialects.postgresql import UUID
@@ -16,11 +20,21 @@ from sqlalchemy.orm import relationship
 
 from .database import Base
 
+# Слоты шардирования рассылки: воркер index из count берёт устройства
+# с push_shard % count == index (см. cron_send_pushes.Shard), поэтому count <= PUSH_SHARD_SLOTS
+PUSH_SHARD_SLOTS = 1024
+
+
+def random_push_shard() -> int:
+    return random.randrange(PUSH_SHARD_SLOTS)
+
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Знаки пользователя битовой маской по ZODIAC_SIGNS (SIGN_STORAGE_MODE=mask/dual)
+    signs_mask = Column(SmallInteger, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     devices = relationship("UserDevice", back_populates="user")
@@ -44,10 +58,42 @@ class UserDevice(Base):
     last_push_date = Column(Date, nullable=True)
     # Флаг активности пушей (колонка уже есть в БД: boolean NOT NULL DEFAULT true)
     is_active = Column(Boolean, nullable=False, server_default="true")
+    # Аренда устройства запуском рассылки: кто взял и до какого момента (UTC)
+    push_claim_id = Column(String(36), nullable=True)
+    push_claimed_until = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Временные ошибки отправки подряд и момент (UTC), раньше которого не повторяем
+    push_failures = Column(Integer, nullable=True)
+    push_retry_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Когда FCM отверг токен как мёртвый (UTC); NULL — токен рабочий.
+    # Отдельно от is_active: тот — выбор пользователя в /user/settings
+    token_invalid_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Слот шардирования рассылки, выдаётся при создании и больше не меняется
+    push_shard = Column(SmallInteger, nullable=False, default=random_push_shard)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="devices")
 
+    __table_args__ = (
+        # register_device: upsert устройства по (user_id, fcm_token) — ON CONFLICT нужен уникальный индекс
+        Index("uq_user_devices_user_token", "user_id", "fcm_token", unique=True),
+        # /user/settings: самое раннее устройство пользователя
+        Index("ix_user_devices_user_created", "user_id", "created_at"),
+    )
+
+
+# Рассылка выбирает активные устройства диапазоном по push_time (см. cron_send_pushes.due_windows).
+# Частичный индекс: неактивные устройства в него не попадают. Условие совпадает с запросом
+# (UserDevice.is_active.is_(True)), иначе планировщик SQLite его не использует.
+# push_shard в индексе — фильтр шарда проверяется без чтения строк таблицы.
+Index(
+    "ix_user_devices_active_push_time",
+    UserDevice.push_time,
+    UserDevice.last_push_date,
+    UserDevice.push_shard,
+    postgresql_where=UserDevice.is_active.is_(True),
+    sqlite_where=UserDevice.is_active.is_(True),
+)
+
 
 class Horoscope(Base):
     __tablename__ = "horoscopes"
@@ -60,8 +106,45 @@ class Horoscope(Base):
     text = Column(Text, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # /horoscope/today, рассылка и пайплайн генерации: date = ? AND lang = ? AND sign IN (...)
+        Index("ix_horoscopes_date_lang_sign", "date", "lang", "sign"),
+    )
+
+
+class GenerationStatus(Base):
+    """Статус генерации одного гороскопа (sign, lang, date) — чекпоинт пайплайна."""
+
+    __tablename__ = "generation_status"
+
+    sign = Column(String(20), primary_key=True)
+    lang = Column(String(2), primary_key=True)
+    date = Column(Date, primary_key=True)
+    # pending / done / failed
+    status = Column(String(10), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DeepseekResponse(Base):
+    """
+    Постоянный кэш ответов DeepSeek: повторный запуск генерации с тем же промптом
+    не платит за вызов. prompt_hash — хэш модели, параметров и всех сообщений.
+    """
+
+    __tablename__ = "deepseek_responses"
+
+    sign = Column(String(20), primary_key=True)
+    lang = Column(String(2), primary_key=True)
+    date = Column(Date, primary_key=True)
+    prompt_hash = Column(String(64), primary_key=True)
+    text = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
 
 class UserSign(Base):
+    # Поиск по user_id покрывает первичный ключ (user_id, sign) — отдельный индекс не нужен
     __tablename__ = "user_signs"
 
     user_id = Column(
@@ -0,0 +1,105 @@
+# backend/regeneration.py
+#
+# Фоновая догенерация гороскопов, которых нет на нужную дату: API отдаёт
+# устаревший текст (см. HoroscopeCache, fallback=True) и ставит ключ сюда.
+
+import logging
+import threading
+import time as time_mod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from .config import (
+    DEEPSEEK_RATE_BURST,
+    DEEPSEEK_RATE_PER_SEC,
+    REGENERATION_RETRY_SECONDS,
+    STALE_REGENERATION,
+)
+from .database import SessionLocal
+from .deepseek_client import SUPPORTED_LANGS, generate_daily
+from .generation import GenerationKey, TokenBucket, call_with_retry
+from .horoscope_store import save_horoscopes
+from .zodiac import ZODIAC_SIGNS
+
+logger = logging.getLogger(__name__)
+
+
+class Regenerator:
+    """
+    Single-flight догенерация по ключу (sign, lang, date):
+    - ключ, который уже генерируется, повторно не ставится — сколько бы запросов его ни ждали;
+    - после ошибки ключ не берётся ещё retry_seconds, чтобы лежащий DeepSeek не получал
+      по вызову на каждый запрос API;
+    - один фоновый поток и свой token bucket: догенерация не отнимает лимит у крона надолго.
+    Ключи с неизвестным знаком или языком отбрасываются.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[..., str] = generate_daily,
+        retry_seconds: float = REGENERATION_RETRY_SECONDS,
+        enabled: bool = STALE_REGENERATION,
+    ):
+        self.generate = generate
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self._bucket = TokenBucket(DEEPSEEK_RATE_PER_SEC, DEEPSEEK_RATE_BURST)
+        self._lock = threading.Lock()
+        self._inflight: set[GenerationKey] = set()
+        self._retry_at: dict[GenerationKey, float] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def request(self, keys: Iterable[GenerationKey]) -> int:
+        """Поставить ключи в фон (без ожидания). Возвращает, сколько ключей реально поставлено."""
+        if not self.enabled:
+            return 0
+        now = time_mod.monotonic()
+        scheduled = []
+        with self._lock:
+            for key in keys:
+                sign, lang, _ = key
+                if sign not in ZODIAC_SIGNS or lang not in SUPPORTED_LANGS:
+                    continue
+                if key in self._inflight or self._retry_at.get(key, 0) > now:
+                    continue
+                self._inflight.add(key)
+                self._retry_at.pop(key, None)
+                scheduled.append(key)
+            if scheduled and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="regenerate")
+            executor = self._executor
+        for key in scheduled:
+            executor.submit(self._run, key)
+        return len(scheduled)
+
+    def inflight(self) -> set[GenerationKey]:
+        with self._lock:
+            return set(self._inflight)
+
+    def wait(self):
+        """Дождаться поставленных ключей (тесты)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, key: GenerationKey):
+        sign, lang, for_date = key
+        try:
+            text = call_with_retry(
+                lambda: self.generate(sign=sign, lang=lang, for_date=for_date), self._bucket
+            )
+            with SessionLocal() as db:
+                save_horoscopes(db, {key: text})
+            logger.info("Regenerated missing horoscope %s/%s/%s", sign, lang, for_date.isoformat())
+        except Exception as e:
+            logger.error("Failed to regenerate horoscope %s/%s/%s: %s", sign, lang, for_date, e)
+            with self._lock:
+                self._retry_at[key] = time_mod.monotonic() + self.retry_seconds
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+
+# Общий экземпляр на процесс
+regenerator = Regenerator()
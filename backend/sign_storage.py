@@ -0,0 +1,116 @@
+# backend/sign_storage.py
+#
+# Чтение/запись знаков пользователя в зависимости от SIGN_STORAGE_MODE:
+# строки user_signs или битовая маска users.signs_mask.
+
+import uuid
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from .config import SIGN_STORAGE_MODE
+from .database import upsert_insert
+from .models import User, UserSign
+from .zodiac import SIGN_BITS, mask_to_signs, signs_to_mask
+
+SIGN_STORAGE_MODES = ("rows", "dual", "mask")
+
+if SIGN_STORAGE_MODE not in SIGN_STORAGE_MODES:
+    raise RuntimeError(f"SIGN_STORAGE_MODE must be one of {SIGN_STORAGE_MODES}, got {SIGN_STORAGE_MODE!r}")
+
+
+def reads_mask(mode: str = SIGN_STORAGE_MODE) -> bool:
+    return mode == "mask"
+
+
+def writes_rows(mode: str = SIGN_STORAGE_MODE) -> bool:
+    return mode in ("rows", "dual")
+
+
+def writes_mask(mode: str = SIGN_STORAGE_MODE) -> bool:
+    return mode in ("dual", "mask")
+
+
+def _checked_mask(signs: list[str], mode: str) -> Optional[int]:
+    if not writes_mask(mode):
+        return None
+    mask = signs_to_mask(signs)
+    if mask is None:
+        raise ValueError(f"Unknown sign in {signs!r}")
+    return mask
+
+
+def insert_user(db: Session, signs: list[str], mode: str = SIGN_STORAGE_MODE) -> UUID:
+    """
+    Новый пользователь сразу со знаками (без коммита): маска — в том же INSERT users,
+    строки user_signs — одним INSERT без DELETE (удалять нечего).
+    """
+    mask = _checked_mask(signs, mode)
+    user_id = uuid.uuid4()
+    db.execute(insert(User).values(id=user_id, signs_mask=mask))
+    if writes_rows(mode) and signs:
+        db.execute(insert(UserSign), [{"user_id": user_id, "sign": sign} for sign in signs])
+    return user_id
+
+
+def replace_user_signs(db: Session, user_id: UUID, signs: list[str], mode: str = SIGN_STORAGE_MODE):
+    """
+    Заменяет набор знаков пользователя (без коммита).
+    Строки user_signs меняются по разнице: DELETE только убранных знаков и
+    INSERT ... ON CONFLICT DO NOTHING для добавленных — неизменный набор ничего не пишет.
+    В режимах с маской неизвестный код знака — ValueError.
+    """
+    mask = _checked_mask(signs, mode)
+    if mask is not None:
+        db.execute(update(User).where(User.id == user_id).values(signs_mask=mask))
+
+    if not writes_rows(mode):
+        return
+
+    db.execute(
+        delete(UserSign).where(UserSign.user_id == user_id, UserSign.sign.not_in(signs))
+    )
+    if not signs:
+        return
+    rows = [{"user_id": user_id, "sign": sign} for sign in signs]
+    upsert = upsert_insert(db)
+    if upsert is None:
+        existing = set(
+            db.execute(select(UserSign.sign).where(UserSign.user_id == user_id)).scalars()
+        )
+        rows = [r for r in rows if r["sign"] not in existing]
+        if rows:
+            db.execute(insert(UserSign), rows)
+        return
+    db.execute(upsert(UserSign).values(rows).on_conflict_do_nothing())
+
+
+def read_user_signs(db: Session, user_id: UUID, mode: str = SIGN_STORAGE_MODE) -> list[str]:
+    if reads_mask(mode):
+        mask = db.query(User.signs_mask).filter(User.id == user_id).scalar()
+        return mask_to_signs(mask or 0)
+    rows = db.query(UserSign.sign).filter(UserSign.user_id == user_id).all()
+    return [r.sign for r in rows]
+
+
+def read_many_user_signs(
+    db: Session, user_ids: list[UUID], mode: str = SIGN_STORAGE_MODE
+) -> dict[UUID, list[str]]:
+    """Знаки нескольких пользователей одним запросом; кого нет в БД — нет и в ответе."""
+    if not user_ids:
+        return {}
+    if reads_mask(mode):
+        rows = db.execute(select(User.id, User.signs_mask).where(User.id.in_(user_ids)))
+        return {r.id: mask_to_signs(r.signs_mask or 0) for r in rows}
+    result: dict[UUID, list[str]] = {}
+    rows = db.execute(select(UserSign.user_id, UserSign.sign).where(UserSign.user_id.in_(user_ids)))
+    for r in rows:
+        result.setdefault(r.user_id, []).append(r.sign)
+    return result
+
+
+def sign_bit(sign_column):
+    """SQL-выражение: бит знака из колонки с кодом знака (0 для неизвестных)."""
+    return case(SIGN_BITS, value=sign_column, else_=0)
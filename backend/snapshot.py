@@ -0,0 +1,106 @@
+# backend/snapshot.py
+
+import gzip
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from .config import SNAPSHOT_GZIP_CACHE_SIZE
+from .horoscope_cache import CachedHoroscope, HoroscopeCache, horoscope_cache
+
+
+@dataclass(frozen=True)
+class SnapshotPart:
+    """Готовый JSON одного элемента ответа /horoscope/today ({sign, title, text[, stale]})."""
+
+    sign: str
+    body: bytes
+    # CRC32 тела — для ETag без повторного хэширования текста
+    crc: int
+    # Текст за прошлую дату (фолбэк HoroscopeCache) — в JSON "stale": true
+    stale: bool = False
+
+
+def encode_part(h: CachedHoroscope, for_date: date) -> SnapshotPart:
+    # Тот же формат, что у JSONResponse FastAPI: без ASCII-экранирования и пробелов
+    item = {"sign": h.sign, "title": h.title, "text": h.text}
+    stale = h.date != for_date
+    if stale:
+        item["stale"] = True
+    body = json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode()
+    return SnapshotPart(sign=h.sign, body=body, crc=zlib.crc32(body), stale=stale)
+
+
+class SnapshotStore:
+    """
+    Предсериализованные ответы /horoscope/today поверх HoroscopeCache.
+    - Каждый (sign, lang, date) кодируется в JSON один раз, пока строка в кэше не сменилась.
+    - Ответ собирается конкатенацией готовых байтов, без Pydantic-моделей.
+    - Сжатые gzip-ответы кэшируются по набору знаков (LRU, не больше gzip_cache_size).
+    """
+
+    def __init__(
+        self,
+        cache: HoroscopeCache = horoscope_cache,
+        gzip_cache_size: int = SNAPSHOT_GZIP_CACHE_SIZE,
+    ):
+        self.cache = cache
+        self.gzip_cache_size = gzip_cache_size
+        self._lock = threading.Lock()
+        self._date: Optional[date] = None
+        self._parts: dict[tuple[str, str], tuple[CachedHoroscope, SnapshotPart]] = {}
+        self._gzip: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def parts(
+        self,
+        db: Session,
+        signs: Iterable[str],
+        lang: str,
+        for_date: date,
+        fallback: bool = False,
+    ) -> list[SnapshotPart]:
+        rows = self.cache.get_many(db, signs, lang, for_date, fallback=fallback)
+        result = []
+        with self._lock:
+            if self._date != for_date:
+                self._parts.clear()
+                self._gzip.clear()
+                self._date = for_date
+            for row in rows:
+                entry = self._parts.get((row.sign, lang))
+                # Строка в HoroscopeCache сменилась (TTL/перегенерация) — кодируем заново
+                if entry is None or entry[0] is not row:
+                    entry = (row, encode_part(row, for_date))
+                    self._parts[(row.sign, lang)] = entry
+                result.append(entry[1])
+        return result
+
+    @staticmethod
+    def render(parts: list[SnapshotPart]) -> bytes:
+        return b"[" + b",".join(p.body for p in parts) + b"]"
+
+    def render_gzip(self, parts: list[SnapshotPart]) -> bytes:
+        key = tuple((p.sign, p.crc) for p in parts)
+        with self._lock:
+            body = self._gzip.get(key)
+            if body is not None:
+                self._gzip.move_to_end(key)
+                return body
+
+        body = gzip.compress(self.render(parts), mtime=0)
+
+        with self._lock:
+            self._gzip[key] = body
+            while len(self._gzip) > self.gzip_cache_size:
+                self._gzip.popitem(last=False)
+        return body
+
+
+# Общий экземпляр на процесс
+snapshot_store = SnapshotStore()
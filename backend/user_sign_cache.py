@@ -0,0 +1,184 @@
+# backend/user_sign_cache.py
+
+import threading
+import time as time_mod
+from collections import OrderedDict
+from typing import Optional, Protocol
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from .config import (
+    USER_SIGN_CACHE_LOCAL_TTL_SECONDS,
+    USER_SIGN_CACHE_REDIS_URL,
+    USER_SIGN_CACHE_SIZE,
+    USER_SIGN_CACHE_TTL_SECONDS,
+)
+from .sign_storage import read_many_user_signs, read_user_signs
+from .zodiac import mask_to_signs, signs_to_mask
+
+
+class SharedSignBackend(Protocol):
+    """Общее для всех воркеров хранилище масок: ключ — str(user_id)."""
+
+    def get(self, key: str) -> Optional[int]: ...
+
+    def set(self, key: str, mask: int, ttl_seconds: int) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class RedisSignBackend:
+    """Маски в Redis (пакет redis ставится отдельно, только если он нужен)."""
+
+    prefix = "user_signs:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[int]:
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else None
+
+    def set(self, key: str, mask: int, ttl_seconds: int) -> None:
+        self.client.set(self.prefix + key, mask, ex=ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+class FakeSharedSignBackend:
+    """Общий бэкенд в памяти: заменяет Redis в тестах и бенчмарках (один экземпляр на «воркеров»)."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time_mod.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key: str, mask: int, ttl_seconds: int) -> None:
+        with self._lock:
+            self._data[key] = (time_mod.monotonic() + ttl_seconds, mask)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class UserSignCache:
+    """
+    Кэш user_id → набор знаков, хранится как 12-битная маска.
+    - Локальный слой: LRU на max_size записей с TTL.
+    - Необязательный общий слой (Redis) для согласованности между воркерами;
+      с ним локальный TTL короткий (local_ttl_seconds).
+    - Запись сквозная: эндпоинты, меняющие знаки, вызывают set() после коммита.
+    Наборы с кодами вне ZODIAC_SIGNS не кэшируются — их всегда читаем из БД.
+    """
+
+    def __init__(
+        self,
+        max_size: int = USER_SIGN_CACHE_SIZE,
+        ttl_seconds: int = USER_SIGN_CACHE_TTL_SECONDS,
+        shared: Optional[SharedSignBackend] = None,
+        local_ttl_seconds: int = USER_SIGN_CACHE_LOCAL_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.local_ttl = min(local_ttl_seconds, ttl_seconds) if shared else ttl_seconds
+        self._lock = threading.Lock()
+        self._items: OrderedDict[UUID, tuple[float, int]] = OrderedDict()
+
+    def get(self, user_id: UUID) -> Optional[list[str]]:
+        mask = self._get_local(user_id)
+        if mask is None and self.shared is not None:
+            mask = self.shared.get(str(user_id))
+            if mask is not None:
+                self._set_local(user_id, mask)
+        return mask_to_signs(mask) if mask is not None else None
+
+    def set(self, user_id: UUID, signs: list[str]):
+        mask = signs_to_mask(signs)
+        if mask is None:
+            self.invalidate(user_id)
+            return
+        self._set_local(user_id, mask)
+        if self.shared is not None:
+            self.shared.set(str(user_id), mask, self.ttl_seconds)
+
+    def invalidate(self, user_id: UUID):
+        with self._lock:
+            self._items.pop(user_id, None)
+        if self.shared is not None:
+            self.shared.delete(str(user_id))
+
+    def load(self, db: Session, user_id: UUID) -> list[str]:
+        """Знаки пользователя из кэша, при промахе — из БД (см. sign_storage) с записью в кэш."""
+        signs = self.get(user_id)
+        if signs is not None:
+            return signs
+        signs = read_user_signs(db, user_id)
+        self.set(user_id, signs)
+        return signs
+
+    def get_many(self, user_ids: list[UUID]) -> dict[UUID, list[str]]:
+        """get() для списка: в ответе только попадания."""
+        result = {}
+        for user_id in user_ids:
+            signs = self.get(user_id)
+            if signs is not None:
+                result[user_id] = signs
+        return result
+
+    def set_many(self, items: dict[UUID, list[str]]):
+        for user_id, signs in items.items():
+            self.set(user_id, signs)
+
+    def load_many(self, db: Session, user_ids: list[UUID]) -> dict[UUID, list[str]]:
+        """load() для списка: промахи добираются одним запросом."""
+        result = self.get_many(user_ids)
+        misses = [user_id for user_id in user_ids if user_id not in result]
+        if misses:
+            loaded = read_many_user_signs(db, misses)
+            loaded = {user_id: loaded.get(user_id, []) for user_id in misses}
+            self.set_many(loaded)
+            result.update(loaded)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def _get_local(self, user_id: UUID) -> Optional[int]:
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time_mod.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return entry[1]
+
+    def _set_local(self, user_id: UUID, mask: int):
+        with self._lock:
+            self._items[user_id] = (time_mod.monotonic() + self.local_ttl, mask)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+def make_user_sign_cache() -> UserSignCache:
+    shared = RedisSignBackend(USER_SIGN_CACHE_REDIS_URL) if USER_SIGN_CACHE_REDIS_URL else None
+    return UserSignCache(shared=shared)
+
+
+# Общий экземпляр на процесс
+user_sign_cache = make_user_sign_cache()
@@ -0,0 +1,69 @@
+# backend/zodiac.py
+
+from typing import Iterable, Optional
+
+# Технические коды знаков, как в UserSign.sign и онбординге
+ZODIAC_SIGNS = [
+    "aries",
+    "taurus",
+    "gemini",
+    "cancer",
+    "leo",
+    "virgo",
+    "libra",
+    "scorpio",
+    "sagittarius",
+    "capricorn",
+    "aquarius",
+    "pisces",
+]
+
+# Русские названия для заголовков
+RUSSIAN_SIGN_NAMES = {
+    "aries": "Овен",
+    "taurus": "Телец",
+    "gemini": "Близнецы",
+    "cancer": "Рак",
+    "leo": "Лев",
+    "virgo": "Дева",
+    "libra": "Весы",
+    "scorpio": "Скорпион",
+    "sagittarius": "Стрелец",
+    "capricorn": "Козерог",
+    "aquarius": "Водолей",
+    "pisces": "Рыбы",
+}
+
+ENGLISH_SIGN_NAMES = {
+    "aries": "Aries",
+    "taurus": "Taurus",
+    "gemini": "Gemini",
+    "cancer": "Cancer",
+    "leo": "Leo",
+    "virgo": "Virgo",
+    "libra": "Libra",
+    "scorpio": "Scorpio",
+    "sagittarius": "Sagittarius",
+    "capricorn": "Capricorn",
+    "aquarius": "Aquarius",
+    "pisces": "Pisces",
+}
+
+# Бит знака в маске — его позиция в ZODIAC_SIGNS (aries = 1, taurus = 2, …, pisces = 2048)
+SIGN_BITS = {sign: 1 << i for i, sign in enumerate(ZODIAC_SIGNS)}
+
+
+def signs_to_mask(signs: Iterable[str]) -> Optional[int]:
+    """Набор знаков → 12-битная маска; None, если встретился неизвестный код."""
+    mask = 0
+    for sign in signs:
+        bit = SIGN_BITS.get(sign)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def mask_to_signs(mask: int) -> list[str]:
+    """12-битная маска → знаки в порядке ZODIAC_SIGNS."""
+    return [sign for sign, bit in SIGN_BITS.items() if mask & bit]
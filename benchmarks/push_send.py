@@ -0,0 +1,58 @@
+# benchmarks/push_send.py
+#
+# Офлайн-сравнение пропускной способности рассылки: по одному пушу vs пачками.
+# Запуск из корня репозитория:
+#   python -m benchmarks.push_send --devices 20000 --call-latency 0.05
+
+import argparse
+import time
+import uuid
+
+from backend.cron_send_pushes import PendingPush, push_title, send_pushes_batched, PUSH_DATA
+from backend.fcm_transport import FakeFcmTransport
+
+
+def make_pushes(n: int, distinct_bodies: int) -> list[PendingPush]:
+    return [
+        PendingPush(
+            device_id=uuid.uuid4(),
+            token=f"token-{i}",
+            lang="ru",
+            body=f"preview #{i % distinct_bodies}",
+        )
+        for i in range(n)
+    ]
+
+
+def run_single(transport, pushes):
+    for p in pushes:
+        transport.send(p.token, push_title(p.lang), p.body, PUSH_DATA)
+
+
+def run_batch(transport, pushes):
+    for _ in send_pushes_batched(transport, pushes):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--distinct-bodies", type=int, default=12)
+    parser.add_argument("--call-latency", type=float, default=0.02, help="секунд на HTTP-вызов")
+    parser.add_argument("--message-latency", type=float, default=0.0001, help="секунд на сообщение")
+    args = parser.parse_args()
+
+    pushes = make_pushes(args.devices, args.distinct_bodies)
+    for name, runner in (("single", run_single), ("batch", run_batch)):
+        transport = FakeFcmTransport(args.call_latency, args.message_latency)
+        started = time.perf_counter()
+        runner(transport, pushes)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{name:>6}: {transport.messages} msgs, {transport.calls} calls, "
+            f"{elapsed:.2f}s, {transport.messages / elapsed:,.0f} msg/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/seed.py
+#
+# Генератор синтетических данных по схеме backend/models.py.
+
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+
+from sqlalchemy import Engine, insert, select
+
+from backend.horoscope_store import make_horoscope_id, make_title
+from backend.models import Horoscope, User, UserDevice, UserSign
+from backend.zodiac import ZODIAC_SIGNS, signs_to_mask
+
+
+@dataclass
+class SeedResult:
+    users: int = 0
+    devices: int = 0
+    signs: int = 0
+    horoscopes: int = 0
+    # Случайная выборка (user_id, fcm_token) для точечных запросов
+    sample: list[tuple[uuid.UUID, str]] = field(default_factory=list)
+
+
+def seed_database(
+    engine: Engine,
+    users: int = 10_000,
+    devices_per_user: int = 1,
+    max_signs_per_user: int = 3,
+    langs: tuple[str, ...] = ("ru",),
+    start_date: date | None = None,
+    days: int = 1,
+    active_share: float = 0.9,
+    sample_size: int = 1000,
+    batch_size: int = 10_000,
+    seed: int = 42,
+) -> SeedResult:
+    """
+    Заполняет базу пользователями, устройствами, знаками и гороскопами.
+    push_time равномерно по минутам суток, доля активных устройств — active_share.
+    Схема должна уже существовать (backend.migrations.upgrade).
+    """
+    rnd = random.Random(seed)
+    start_date = start_date or date.today()
+    result = SeedResult()
+
+    with engine.begin() as conn:
+        rows = [
+            {
+                "id": make_horoscope_id(sign, lang, start_date + timedelta(days=d)),
+                "sign": sign,
+                "date": start_date + timedelta(days=d),
+                "lang": lang,
+                "title": make_title(sign, lang, start_date + timedelta(days=d)),
+                "text": f"Synthetic horoscope for {sign} ({lang}). " * 8,
+            }
+            for d in range(days)
+            for lang in langs
+            for sign in ZODIAC_SIGNS
+        ]
+        conn.execute(insert(Horoscope), rows)
+        result.horoscopes = len(rows)
+
+    user_rows, device_rows, sign_rows = [], [], []
+
+    def flush(conn):
+        if user_rows:
+            conn.execute(insert(User), user_rows)
+        if device_rows:
+            conn.execute(insert(UserDevice), device_rows)
+        if sign_rows:
+            conn.execute(insert(UserSign), sign_rows)
+        user_rows.clear()
+        device_rows.clear()
+        sign_rows.clear()
+
+    with engine.begin() as conn:
+        for i in range(users):
+            user_id = uuid.UUID(int=rnd.getrandbits(128), version=4)
+            signs = rnd.sample(ZODIAC_SIGNS, rnd.randint(1, max_signs_per_user))
+            # Знаки пишем в обоих видах, чтобы база подходила для любого SIGN_STORAGE_MODE
+            user_rows.append({"id": user_id, "signs_mask": signs_to_mask(signs)})
+            for j in range(devices_per_user):
+                minute = rnd.randrange(24 * 60)
+                token = f"bench-token-{i}-{j}"
+                device_rows.append(
+                    {
+                        "id": uuid.UUID(int=rnd.getrandbits(128), version=4),
+                        "user_id": user_id,
+                        "fcm_token": token,
+                        "lang": rnd.choice(langs),
+                        "push_time": time(minute // 60, minute % 60),
+                        "last_push_date": None,
+                        "is_active": rnd.random() < active_share,
+                    }
+                )
+                if len(result.sample) < sample_size:
+                    result.sample.append((user_id, token))
+                elif rnd.random() < sample_size / (i + 1):
+                    result.sample[rnd.randrange(sample_size)] = (user_id, token)
+            for sign in signs:
+                sign_rows.append({"user_id": user_id, "sign": sign})
+
+            result.users += 1
+            result.devices += devices_per_user
+            if len(device_rows) >= batch_size:
+                result.signs += len(sign_rows)
+                flush(conn)
+        result.signs += len(sign_rows)
+        flush(conn)
+
+    return result
+
+
+def existing_sample(engine: Engine, sample_size: int = 1000) -> list[tuple[uuid.UUID, str]]:
+    """Выборка (user_id, fcm_token) из уже заполненной базы — для запусков с --reuse."""
+    with engine.connect() as conn:
+        rows = conn.execute(select(UserDevice.user_id, UserDevice.fcm_token).limit(sample_size)).all()
+    return [(r.user_id, r.fcm_token) for r in rows]
@@ -0,0 +1,86 @@
+# tests/test_push_previews.py
+#
+# Выбор знака для превью пуша: свежий гороскоп на дату окна важнее устаревшего
+# фолбэка по другому знаку пользователя.
+
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import cron_send_pushes
+from backend.cron_send_pushes import PushWindow, iter_due_chunks
+from backend.horoscope_cache import HoroscopeCache
+from backend.models import Base, Horoscope, User, UserDevice, UserSign
+
+TODAY = date(2026, 10, 18)
+WINDOW = PushWindow(for_date=TODAY, start=time(8, 50), end=time(9, 10))
+NOW_UTC = datetime(2026, 10, 18, 6, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(cron_send_pushes, "reads_mask", lambda: False)
+    monkeypatch.setattr(cron_send_pushes, "horoscope_cache", HoroscopeCache(stale_max_days=3))
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def add_horoscope(db, sign: str, for_date: date, text: str):
+    db.add(Horoscope(
+        id=f"{sign}-ru-{for_date.isoformat()}",
+        sign=sign,
+        date=for_date,
+        lang="ru",
+        title=sign,
+        text=text,
+    ))
+
+
+def add_device(db, signs: list[str]) -> uuid.UUID:
+    user = User(id=uuid.uuid4())
+    db.add(user)
+    db.add_all(UserSign(user_id=user.id, sign=sign) for sign in signs)
+    device = UserDevice(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        fcm_token=f"token-{user.id}",
+        lang="ru",
+        push_time=time(9, 0),
+        is_active=True,
+    )
+    db.add(device)
+    return device.id
+
+
+def bodies(db) -> dict[uuid.UUID, str]:
+    return {
+        push.device_id: push.body
+        for chunk in iter_due_chunks(db, WINDOW, NOW_UTC, chunk_size=0)
+        for push in chunk
+    }
+
+
+def test_fresh_sign_wins_over_stale_one(db):
+    add_horoscope(db, "leo", TODAY, "СВЕЖИЙ лев")
+    add_horoscope(db, "aries", TODAY - timedelta(days=2), "УСТАРЕВШИЙ овен")
+    device_id = add_device(db, ["leo", "aries"])
+    db.commit()
+
+    assert bodies(db) == {device_id: "СВЕЖИЙ лев"}
+
+
+def test_stale_sign_is_used_when_no_fresh_one(db):
+    add_horoscope(db, "aries", TODAY - timedelta(days=2), "УСТАРЕВШИЙ овен")
+    add_horoscope(db, "leo", TODAY - timedelta(days=5), "слишком старый лев")
+    device_id = add_device(db, ["leo", "aries"])
+    db.commit()
+
+    assert bodies(db) == {device_id: "УСТАРЕВШИЙ овен"}
@@ -0,0 +1,94 @@
+# tests/test_regeneration.py
+#
+# Regenerator: повторная постановка ключа «в полёте» не даёт второго вызова,
+# после ошибки ключ не берётся до конца паузы retry_seconds.
+
+import threading
+from contextlib import nullcontext
+from datetime import date
+
+import pytest
+
+from backend import regeneration
+from backend.regeneration import Regenerator
+
+KEY = ("leo", "ru", date(2026, 10, 18))
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(regeneration, "SessionLocal", nullcontext)
+    monkeypatch.setattr(regeneration, "save_horoscopes", lambda db, texts: saved.update(texts))
+    return saved
+
+
+def test_inflight_key_is_generated_once(saved):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def generate(sign, lang, for_date):
+        calls.append((sign, lang, for_date))
+        started.set()
+        release.wait(5)
+        return "текст"
+
+    regenerator = Regenerator(generate=generate, enabled=True)
+    assert regenerator.request([KEY]) == 1
+    assert started.wait(5)
+    assert regenerator.inflight() == {KEY}
+    # Тот же ключ, пока он генерируется, повторно не ставится
+    assert regenerator.request([KEY, KEY]) == 0
+
+    release.set()
+    regenerator.wait()
+    assert calls == [KEY]
+    assert saved == {KEY: "текст"}
+    assert regenerator.inflight() == set()
+
+
+def test_unknown_keys_are_dropped(saved):
+    regenerator = Regenerator(generate=lambda **_: "текст", enabled=True)
+    assert regenerator.request([("ophiuchus", "ru", KEY[2]), ("leo", "xx", KEY[2])]) == 0
+    regenerator.wait()
+    assert saved == {}
+
+
+def test_failed_key_waits_for_retry_cooldown(saved):
+    calls = []
+
+    def generate(sign, lang, for_date):
+        calls.append(sign)
+        raise ValueError("DeepSeek недоступен")
+
+    regenerator = Regenerator(generate=generate, retry_seconds=3600, enabled=True)
+    assert regenerator.request([KEY]) == 1
+    regenerator.wait()
+    assert regenerator.request([KEY]) == 0
+    regenerator.wait()
+    assert calls == ["leo"]
+    assert saved == {}
+
+
+def test_failed_key_is_retried_after_cooldown(saved):
+    results = iter([ValueError("DeepSeek недоступен"), "текст"])
+
+    def generate(sign, lang, for_date):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    regenerator = Regenerator(generate=generate, retry_seconds=0, enabled=True)
+    assert regenerator.request([KEY]) == 1
+    regenerator.wait()
+    assert regenerator.request([KEY]) == 1
+    regenerator.wait()
+    assert saved == {KEY: "текст"}
+
+
+def test_disabled_regenerator_schedules_nothing(saved):
+    regenerator = Regenerator(generate=lambda **_: "текст", enabled=False)
+    assert regenerator.request([KEY]) == 0
+    regenerator.wait()
+    assert saved == {}
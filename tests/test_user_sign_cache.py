@@ -0,0 +1,128 @@
+# tests/test_user_sign_cache.py
+#
+# UserSignCache с FakeSharedSignBackend вместо Redis: сквозная запись между «воркерами»,
+# TTL, вытеснение LRU и отказ кэшировать неизвестные коды знаков.
+
+import uuid
+
+import pytest
+
+from backend import user_sign_cache as cache_module
+from backend.user_sign_cache import FakeSharedSignBackend, UserSignCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time_mod, "monotonic", clock)
+    return clock
+
+
+def test_write_through_is_visible_in_another_worker():
+    shared = FakeSharedSignBackend()
+    worker_a = UserSignCache(shared=shared)
+    worker_b = UserSignCache(shared=shared)
+    user_id = uuid.uuid4()
+
+    assert worker_b.get(user_id) is None
+    worker_a.set(user_id, ["leo", "aries"])
+
+    # Маска хранит знаки в порядке ZODIAC_SIGNS
+    assert worker_b.get(user_id) == ["aries", "leo"]
+
+
+def test_update_reaches_other_worker_after_local_ttl(clock):
+    shared = FakeSharedSignBackend()
+    worker_a = UserSignCache(shared=shared, ttl_seconds=600, local_ttl_seconds=5)
+    worker_b = UserSignCache(shared=shared, ttl_seconds=600, local_ttl_seconds=5)
+    user_id = uuid.uuid4()
+
+    worker_a.set(user_id, ["leo"])
+    assert worker_b.get(user_id) == ["leo"]
+
+    worker_a.set(user_id, ["virgo"])
+    # Локальный слой worker_b ещё держит старое значение
+    assert worker_b.get(user_id) == ["leo"]
+    clock.now += 6
+    assert worker_b.get(user_id) == ["virgo"]
+
+
+def test_invalidate_removes_entry_from_shared_backend():
+    shared = FakeSharedSignBackend()
+    worker_a = UserSignCache(shared=shared)
+    worker_b = UserSignCache(shared=shared)
+    user_id = uuid.uuid4()
+
+    worker_a.set(user_id, ["leo"])
+    worker_a.invalidate(user_id)
+
+    assert worker_a.get(user_id) is None
+    assert worker_b.get(user_id) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = UserSignCache(ttl_seconds=10)
+    user_id = uuid.uuid4()
+
+    cache.set(user_id, ["leo"])
+    clock.now += 9
+    assert cache.get(user_id) == ["leo"]
+    clock.now += 2
+    assert cache.get(user_id) is None
+
+
+def test_shared_entries_expire_after_ttl(clock):
+    shared = FakeSharedSignBackend()
+    cache = UserSignCache(shared=shared, ttl_seconds=10, local_ttl_seconds=1)
+    user_id = uuid.uuid4()
+
+    cache.set(user_id, ["leo"])
+    clock.now += 11
+    assert shared.get(str(user_id)) is None
+    assert cache.get(user_id) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = UserSignCache(max_size=2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    cache.set(first, ["aries"])
+    cache.set(second, ["taurus"])
+    # Чтение делает first самым свежим — вытесняется second
+    assert cache.get(first) == ["aries"]
+    cache.set(third, ["gemini"])
+
+    assert cache.get(first) == ["aries"]
+    assert cache.get(second) is None
+    assert cache.get(third) == ["gemini"]
+
+
+def test_unknown_sign_codes_are_not_cached():
+    shared = FakeSharedSignBackend()
+    cache = UserSignCache(shared=shared)
+    user_id = uuid.uuid4()
+
+    cache.set(user_id, ["leo", "ophiuchus"])
+
+    assert cache.get(user_id) is None
+    assert shared.get(str(user_id)) is None
+
+
+def test_unknown_sign_codes_drop_previous_entry():
+    shared = FakeSharedSignBackend()
+    cache = UserSignCache(shared=shared)
+    user_id = uuid.uuid4()
+
+    cache.set(user_id, ["leo"])
+    cache.set(user_id, ["ophiuchus"])
+
+    assert cache.get(user_id) is None
+    assert shared.get(str(user_id)) is None